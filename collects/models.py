@@ -2,8 +2,10 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models.signals import post_delete, post_save
 
 from commons.managers import GenericQuerySet, ManagerDescriptor, GenericRelatedManager, GenericReversedManager
+from commons.relations import ViewerRelations, invalidate_viewer_relations
 
 
 class Collection(models.Model):
@@ -46,10 +48,7 @@ class Collection(models.Model):
 class CollectManager(models.Manager):
 
     def is_collected(self, user, obj):
-        if not user.is_authenticated:
-            return False
-
-        return self.filter(sender=user, content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk).exists()
+        return obj.pk in ViewerRelations(user).resolve('collected', [obj])
 
 
 class Collect(models.Model):
@@ -79,3 +78,7 @@ class Collect(models.Model):
 
     def is_owned(self, user):
         return self.collection.owner == user
+
+
+post_save.connect(invalidate_viewer_relations, sender=Collect)
+post_delete.connect(invalidate_viewer_relations, sender=Collect)
@@ -3,9 +3,9 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
-from markdown import markdown
 
 from commons.managers import ManagerDescriptor, GenericReversedManager
+from commons.rendering import MarkdownMixin
 
 
 def get_sentinel_user():
@@ -13,7 +13,7 @@ def get_sentinel_user():
     return user
 
 
-class Comment(models.Model):
+class Comment(MarkdownMixin, models.Model):
     body = models.TextField('正文')
     body_html = models.TextField('源码')
     created = models.DateTimeField('创建时间', auto_now_add=True, editable=False)
@@ -47,9 +47,5 @@ class Comment(models.Model):
     def __str__(self):
         return f'{self.author} -> {self.content_object}'
 
-    def save(self, *args, **kwargs):
-        self.body_html = markdown(self.body, extensions=['fenced_code', 'codehilite'])
-        super().save(*args, **kwargs)
-
     def is_owned(self, user):
         return self.author == user
@@ -2,6 +2,7 @@ class Messages:
     TOKEN_NOT_FOUND = 'Token id does not exist within session.'
     TOKEN_MISMATCH = 'Token id mismatch within session.'
     UNKNOWN_UID = 'Token contained no recognizable user identification.'
+    INVALID_SIGNATURE = 'Token signature is invalid.'
     UNKNOWN_ALGORITHM = "Unrecognized algorithm '{0}'"
     REQUIRE_CRYPTO = "You must have cryptography installed to use '{0}'"
     USER_NOT_FOUND = 'User object does not exist.'
@@ -22,7 +23,21 @@ class Messages:
     QUESTION_NOT_ALLOWED = "This question doesn't belong to you."
     VOTE_MAX_NUM = "You can vote this question at least {0} choices."
     INSTANCE_NOT_ALLOWED = "Content type `{0}` and target object `{1}` doesn't belong to you."
+    VERSE_REQUIRED = 'Please enter a verse.'
+    UNKNOWN_METER = "Unrecognized meter '{0}'"
+    UNKNOWN_MODE = "Unrecognized mode '{0}'"
+    MODE_NOT_FILTERABLE = "Mode '{0}' can not be combined with filters."
 
 
 class CacheKeySet:
     CAPTCHA = 'oauth:{tape}:{field}:{value}:captcha'
+    VIEWER_RELATION = 'relations:{relation}:uid:{uid}:ct:{ct}'
+    TIMELINE = 'timeline:users:uid:{uid}'
+    VIEW_COUNTS = 'counters:views:{label}'
+    MARKDOWN = 'markdown:sha1:{hash}'
+    USER_SNAPSHOT = 'oauth:users:uid:{uid}:snapshot'
+    NONCE = 'oauth:nonce:{bucket}:{nonce}'
+    PROSODY = 'poetry:prosody:table'
+    POETRY_POOL = 'poetry:pool:{collection}'
+    POETRY_POOL_EMPTY = 'poetry:pool:{collection}:empty'
+    POETRY_DAILY = 'poetry:daily:{collection}:{date}'
@@ -3,16 +3,23 @@ from functools import wraps
 from rest_framework.response import Response
 
 
-def paginate(serializer_class):
+def paginate(serializer_class, pagination_class=None):
+    """
+    Args:
+        serializer_class: 序列化类
+        pagination_class: 分页类，默认使用视图的分页类
+    """
     def decorator(func):
         @wraps(func)
         def wrapped(view, instance, request):
             queryset = func(view, instance, request)
-            page = view.paginate_queryset(queryset)
+            context = view.get_serializer_context()
+            paginator = view.paginator if pagination_class is None else pagination_class()
+            page = paginator.paginate_queryset(queryset, request, view=view) if paginator is not None else None
             if page is not None:
-                serializer = serializer_class(page, many=True)
-                return view.get_paginated_response(serializer.data)
-            serializer = serializer_class(queryset, many=True)
+                serializer = serializer_class(page, many=True, context=context)
+                return paginator.get_paginated_response(serializer.data)
+            serializer = serializer_class(queryset, many=True, context=context)
             return Response(serializer.data)
         return wrapped
     return decorator
@@ -5,15 +5,19 @@ from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.manager import BaseManager
 from django.utils.module_loading import import_string
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import CharField, ReadOnlyField, RegexField
 from rest_framework.relations import RelatedField
+from rest_framework.serializers import ListSerializer
 from rest_framework.validators import UniqueValidator
 
 from commons.constants import Messages
 from commons.fields.phonenumber import PhoneNumber
+from commons.relations import ViewerRelations
 from commons.utils import timesince
+from counters.buffers import apply_pending_views
 
 
 CaptchaField = functools.partial(RegexField, regex=re.compile(r'^\d{6}$'))
@@ -25,6 +29,18 @@ class TimesinceField(ReadOnlyField):
         return timesince(value)
 
 
+class ViewerRelationField(ReadOnlyField):
+    """当前用户与对象的关系，需配合 `ViewerRelationsMixin` 使用"""
+
+    def __init__(self, relation, **kwargs):
+        self.relation = relation
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.parent.get_viewer_relation(value, self.relation)
+
+
 class PhoneField(CharField):
     default_error_messages = {'invalid': 'Enter a valid phone number.'}
 
@@ -167,3 +183,53 @@ class UniqueFieldsMixin:
             if field_name in self.omit_fields:
                 field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
         return fields
+
+
+class ViewerRelationsListSerializer(ListSerializer):
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        iterable = list(iterable)
+        self.child.prefetch_viewer_relations(iterable)
+        return super().to_representation(iterable)
+
+
+class ViewerRelationsMixin:
+    """
+    整页对象的 `ViewerRelationField` 共用一次查询，而不是逐行查询
+
+    需要在 `Meta` 中设置 `list_serializer_class = ViewerRelationsListSerializer`
+    """
+
+    def prefetch_viewer_relations(self, instances):
+        request = self.context.get('request')
+        viewer = ViewerRelations(getattr(request, 'user', None))
+        relations = {field.relation for field in self.fields.values() if isinstance(field, ViewerRelationField)}
+        self._viewer_relations = {relation: viewer.resolve(relation, instances) for relation in relations}
+        self._viewer_relations_pks = {instance.pk for instance in instances}
+
+    def get_viewer_relation(self, instance, relation):
+        if instance.pk not in getattr(self, '_viewer_relations_pks', ()):
+            self.prefetch_viewer_relations([instance])
+        return instance.pk in self._viewer_relations[relation]
+
+
+class PendingViewsListSerializer(ListSerializer):
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        iterable = list(iterable)
+        apply_pending_views(iterable)
+        return super().to_representation(iterable)
+
+
+class PendingViewsMixin:
+    """
+    `view_count` 包含尚未写入数据库的浏览量
+
+    列表使用 `PendingViewsListSerializer` 时整页只读一次 Redis。
+    """
+
+    def to_representation(self, instance):
+        apply_pending_views([instance])
+        return super().to_representation(instance)
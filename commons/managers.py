@@ -1,32 +1,136 @@
 import functools
+import inspect
+from collections import defaultdict
 
 from django.apps import apps
+from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import transaction
-from django.db.models.aggregates import Count, Max, Min
+from django.db.models.aggregates import Count
+from django.db.models.expressions import OuterRef, Subquery
+from django.db.models.fields import IntegerField
+from django.db.models.functions import Coalesce
 from django.db.models.fields.related import ForeignObject
 from django.db.models.manager import Manager
 from django.db.models.options import Options
-from django.db.models.query import QuerySet
+from django.db.models.query import ModelIterable, QuerySet
 from django.db.models.sql import AND
 from django.db.models.sql.datastructures import Join
 from django.db.models.sql.where import WhereNode
 
-from commons.utils import random
+from commons import sampling
+
+
+def related_count(model, relation):
+    """
+    单个关联的数量，使用相关子查询计算
+
+    多个 `Count()` 同时连接多张关联表时会产生笛卡尔积，既慢又会使计数翻倍，
+    这里每个关联各自按 `object_id` 分组计数，互不影响。
+
+    Args:
+        model (Model): 主模型
+        relation (str): `GenericRelation` 或反向外键的名称
+    """
+    field = model._meta.get_field(relation)
+    related_model = field.related_model
+
+    if isinstance(field, GenericRelation):
+        ct = ContentType.objects.get_for_model(model, for_concrete_model=field.for_concrete_model)
+        group_by = field.object_id_field_name
+        lookups = {field.content_type_field_name: ct.pk, group_by: OuterRef('pk')}
+    elif field.one_to_many:
+        group_by = field.field.name
+        lookups = {group_by: OuterRef('pk')}
+    else:
+        raise ValueError(f"Relation '{relation}' of {model.__name__} can not be counted.")
+
+    queryset = related_model._base_manager.filter(**lookups).order_by().values(group_by)
+    queryset = queryset.annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(queryset, output_field=IntegerField()), 0)
+
+
+def counter_value(model, field):
+    """
+    `counters.Counter` 中存储的计数，按唯一索引查找，不需要聚合
+
+    Args:
+        model (Model): 主模型
+        field (str): 计数字段名称
+    """
+    counter_model = apps.get_model('counters.Counter')
+    ct = ContentType.objects.get_for_model(model)
+    queryset = counter_model._base_manager.filter(content_type=ct.pk, object_id=OuterRef('pk')).values(field)
+    return Coalesce(Subquery(queryset, output_field=IntegerField()), 0)
 
 
 class GenericQuerySet(QuerySet):
 
-    def random(self, amount=1):
-        with transaction.atomic(using=self.db):
-            q = self.aggregate(min_id=Min('id'), max_id=Max('id'), count=Count('id'))
-            if q['count'] == 0:
-                return self.none()
-            if q['count'] <= amount:
-                return self.all()
-            max_id = self.order_by('-pk')[amount:amount+1].first().pk
-            pk = random.randint(q['min_id'], max_id)
-            return self.order_by('pk').filter(pk__gt=pk)[:amount]
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetch_generic_lookups = ()
+        self._prefetch_generic_done = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._prefetch_generic_lookups = self._prefetch_generic_lookups
+        return clone
+
+    def _fetch_all(self):
+        super()._fetch_all()
+        if self._prefetch_generic_lookups and not self._prefetch_generic_done and self._iterable_class is ModelIterable:
+            prefetch_generic_objects(self._result_cache, *self._prefetch_generic_lookups)
+            self._prefetch_generic_done = True
+
+    def prefetch_generic(self, *names):
+        """
+        批量预取 `ManagerDescriptor` 声明的关联，查询次数与实例数量无关
+
+        Sample:
+        ```python
+            Article.objects.prefetch_generic('likers', 'tags')
+        ```
+        """
+        clone = self._chain()
+        clone._prefetch_generic_lookups = clone._prefetch_generic_lookups + names
+        return clone
+
+    def with_counts(self, **relations):
+        """
+        为每个关联添加计数字段
+
+        Sample:
+        ```python
+            Article.objects.with_counts(like_count='likes', comment_count='comments')
+        ```
+        """
+        return self.annotate(**{alias: related_count(self.model, relation) for alias, relation in relations.items()})
+
+    def with_counters(self, *fields):
+        """
+        添加已存储的计数字段
+
+        Sample:
+        ```python
+            Article.objects.with_counters('like_count', 'comment_count')
+        ```
+        """
+        return self.annotate(**{field: counter_value(self.model, field) for field in fields})
+
+    def random(self, amount=1, mode='ids', weight=None):
+        """
+        随机抽取不重复的若干行，返回查询集
+
+        Args:
+            amount (int): 行数
+            mode (str): 抽样方式
+                - ids 缓存主键数组后均匀抽样，默认
+                - tablesample Postgres 按比例抽样，适合大表
+                - weighted 按 `weight` 字段加权抽样
+            weight (str): 权重字段，`weighted` 方式使用
+        """
+        if mode == 'weighted':
+            return sampling.sample_weighted(self, amount, weight)
+        return sampling.SAMPLERS[mode](self, amount)
 
 
 class ManagerDescriptor:
@@ -34,6 +138,10 @@ class ManagerDescriptor:
     def __init__(self, manager, **kwargs):
         self.manager = manager
         self.kwargs = kwargs
+        self.name = None
+
+    def __set_name__(self, model, name):
+        self.name = name
 
     def __get__(self, instance, model):
         if instance is None:
@@ -42,57 +150,154 @@ class ManagerDescriptor:
         if instance.pk is None:
             raise AttributeError(f"Manager isn't accessible via {model.__name__} instance with no primary key.")
 
-        return self.manager(instance=instance, model=model, **self.kwargs)
+        return self.manager(instance=instance, model=model, name=self.name, **self.kwargs)
+
+    def get_relation(self, model):
+        return self.manager.get_relation(model, **self.kwargs)
 
 
-class GenericRelatedManager(Manager):
+class GenericRelationInfo:
+    """
+    实例模型通过中间模型关联目标模型的连接信息
+
+    Args:
+        through (Model): 中间模型
+        target (Model): 目标模型
+        source_column (str): 中间模型中指向实例的列
+        target_column (str): 中间模型中指向目标的列
+        ct_column (str): 中间模型中内容类型的列
+        ct_model (Model): 内容类型对应的模型
     """
-    动作的执行者使用这个类
-        - 我关注的人
-        - 我关注的收藏夹
-        - 我关注的分类
-        - 我关注的话题
-        - 我喜欢的收藏夹
-        - 我喜欢的评论
-        - 我喜欢的文章
-        - 我喜欢的动态
-        - 收藏夹收藏的文章
-        - 收藏夹收藏的动态
 
+    def __init__(self, through, target, source_column, target_column, ct_column, ct_model):
+        self.through = through
+        self.target = target
+        self.source_column = source_column
+        self.target_column = target_column
+        self.ct_column = ct_column
+        self.ct_model = ct_model
+
+    @functools.cached_property
+    def ct_id(self):
+        return ContentType.objects.get_for_model(self.ct_model).pk
+
+    def get_through_queryset(self, pks):
+        kwargs = {f'{self.source_column}__in': pks, self.ct_column: self.ct_id}
+        return self.through._default_manager.filter(**kwargs)
+
+    def get_queryset(self, pk):
+        through = self.get_through_queryset([pk]).values(self.target_column)
+        return self.target._default_manager.filter(pk__in=through)
+
+
+@functools.lru_cache(maxsize=None)
+def get_relation_info(manager, model, through, target):
+    through, target = apps.get_model(through), apps.get_model(target)
+    source_column, target_column, ct_model = manager.resolve(model, through, target)
+    ct_column = next(field.column for field in through._meta.fields if field.related_model is ContentType)
+    return GenericRelationInfo(through, target, source_column, target_column, ct_column, ct_model)
+
+
+def prefetch_generic_objects(instances, *names):
     """
+    批量预取多个实例的 `ManagerDescriptor` 关联，每个关联两次查询
+
+    预取结果保存在 `_prefetched_objects_cache` 中，访问对应的管理器时直接使用。
 
-    def __init__(self, instance, model, through, target) -> None:
+    Sample:
+    ```python
+        articles = list(Article.objects.all()[:20])
+        prefetch_generic_objects(articles, 'likers', 'tags')
+        articles[0].likers.all()  # 不再查询
+    ```
+    """
+    if not instances:
+        return
+
+    model = type(instances[0])
+    pks = {obj.pk for obj in instances}
+    for name in names:
+        descriptor = inspect.getattr_static(model, name, None)
+        if not isinstance(descriptor, ManagerDescriptor):
+            raise ValueError(f"'{name}' is not a generic manager of {model.__name__}.")
+
+        relation = descriptor.get_relation(model)
+        sources = defaultdict(list)
+        for source, target in relation.get_through_queryset(pks).values_list(relation.source_column, relation.target_column):
+            sources[target].append(source)
+
+        # 保持目标模型的默认排序
+        results = defaultdict(list)
+        for obj in relation.target._default_manager.filter(pk__in=sources):
+            for source in sources[obj.pk]:
+                results[source].append(obj)
+
+        for obj in instances:
+            queryset = relation.get_queryset(obj.pk)
+            queryset._result_cache = results[obj.pk]
+            queryset._prefetch_done = True
+            obj.__dict__.setdefault('_prefetched_objects_cache', {})[name] = queryset
+
+
+class GenericManager(Manager):
+    """
+    通过中间模型关联目标模型的管理器，连接信息按 (model, through, target) 缓存
+
+    子类实现类方法 `resolve(model, through, target)`，返回指向实例的列、指向目标的列和内容类型对应的模型。
+    """
+
+    def __init__(self, instance, model, through, target, name=None) -> None:
         """
         Args:
             instance (Model instance): 实例对象
             model (instance Model): 实例模型
             through (through Model): 中间模型
             target (target Model): 目标模型
+            name (str): 管理器在实例模型上的名称
         """
         super().__init__()
         self.model = model
         self.instance = instance
-        self.through = apps.get_model(through)
-        self.target = apps.get_model(target)
+        self.name = name
+        self.relation = self.get_relation(model, through, target)
+        self.through = self.relation.through
+        self.target = self.relation.target
+
+    @classmethod
+    def get_relation(cls, model, through, target):
+        return get_relation_info(cls, model, through, target)
 
     def get_queryset(self):
-        md_pk, ct_pk = None, None
-        for field in self.through._meta.fields:
-            if field.related_model is self.model:
-                md_pk = field.column
-            if field.related_model is ContentType:
-                ct_pk = field.column
+        try:
+            return self.instance._prefetched_objects_cache[self.name]
+        except (AttributeError, KeyError):
+            return self.relation.get_queryset(self.instance.pk)
+
 
-        assert (md_pk is not None and ct_pk is not None)
-        tg_pk = self.through._meta.private_fields[0].fk_field
+class GenericRelatedManager(GenericManager):
+    """
+    动作的执行者使用这个类
+        - 我关注的人
+        - 我关注的收藏夹
+        - 我关注的分类
+        - 我关注的话题
+        - 我喜欢的收藏夹
+        - 我喜欢的评论
+        - 我喜欢的文章
+        - 我喜欢的动态
+        - 收藏夹收藏的文章
+        - 收藏夹收藏的动态
 
-        kwargs = {md_pk: self.instance.pk, ct_pk: ContentType.objects.get_for_model(self.target).pk}
-        queryset = self.target._default_manager.filter(pk__in=self.through._default_manager.filter(**kwargs).values(tg_pk))
+    """
 
-        return queryset
+    @classmethod
+    def resolve(cls, model, through, target):
+        md_pk = next(field.column for field in through._meta.fields if field.related_model is model)
+        tg_pk = through._meta.private_fields[0].fk_field
+        return md_pk, tg_pk, target
 
 
-class GenericReversedManager(Manager):
+class GenericReversedManager(GenericManager):
     """
     动作的接受者使用这个类
         - 贴给我的标签
@@ -109,35 +314,11 @@ class GenericReversedManager(Manager):
 
     """
 
-    def __init__(self, instance, model, through, target) -> None:
-        """
-        Args:
-            instance (Model instance): 实例对象
-            model (instance Model): 实例模型
-            through (through Model): 中间模型
-            target (target Model): 目标模型
-        """
-        super().__init__()
-        self.model = model
-        self.instance = instance
-        self.through = apps.get_model(through)
-        self.target = apps.get_model(target)
-
-    def get_queryset(self):
-        tg_pk, ct_pk = None, None
-        for field in self.through._meta.fields:
-            if field.related_model is self.target:
-                tg_pk = field.column
-            if field.related_model is ContentType:
-                ct_pk = field.column
-
-        assert (tg_pk is not None and ct_pk is not None)
-        md_pk = self.through._meta.private_fields[0].fk_field
-
-        kwargs = {md_pk: self.instance.pk, ct_pk: ContentType.objects.get_for_model(self.model).pk}
-        queryset = self.target._default_manager.filter(pk__in=self.through._default_manager.filter(**kwargs).values(tg_pk))
-
-        return queryset
+    @classmethod
+    def resolve(cls, model, through, target):
+        tg_pk = next(field.column for field in through._meta.fields if field.related_model is target)
+        md_pk = through._meta.private_fields[0].fk_field
+        return md_pk, tg_pk, model
 
 
 class GenericJoin(Join):
@@ -0,0 +1,127 @@
+import base64
+import json
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models.query_utils import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    游标分页，按 `(排序字段, 主键)` 定位下一页
+
+    不执行 `COUNT(*)`，也不使用 `OFFSET`，翻页的代价与页码无关。
+    排序取自查询集的排序或者模型的 `Meta.ordering`，并以主键作为最后的排序字段。
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view=view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        同一模型、同一排序的多个查询集各取一页后合并
+
+        用于 `OR` 条件无法走同一个索引的情况，拆成多个查询集后每个都是一次索引范围扫描。
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(querysets[0])
+        cursor = self.decode_cursor(request, querysets[0].model)
+
+        results = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*(f'-{name}' if desc else name for name, desc in self.ordering))
+            if cursor is not None:
+                queryset = queryset.filter(self.get_seek_filter(cursor))
+            results.extend(queryset[:self.page_size + 1])
+
+        if len(querysets) > 1:
+            # 稳定排序，从最后一个排序字段开始逐个排序，外键按列值比较
+            opts = querysets[0].model._meta
+            for name, desc in reversed(self.ordering):
+                results.sort(key=attrgetter(opts.get_field(name).attname), reverse=desc)
+
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """返回 `[(字段名, 是否倒序), ...]`，最后一项总是主键"""
+        opts = queryset.model._meta
+        ordering = []
+        for name in queryset.query.order_by or opts.ordering:
+            assert isinstance(name, str), 'KeysetPagination only supports ordering by field names.'
+            desc = name.startswith('-')
+            field = opts.pk if name.lstrip('-') == 'pk' else opts.get_field(name.lstrip('-'))
+            ordering.append((field.name, desc))
+
+        if not any(name == opts.pk.name for name, _ in ordering):
+            ordering.append((opts.pk.name, ordering[0][1] if ordering else False))
+        return ordering
+
+    def get_seek_filter(self, cursor):
+        # (a, b, c) > (x, y, z) 展开为 a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        seek, equal = Q(), Q()
+        for (name, desc), value in zip(self.ordering, cursor):
+            seek |= equal & Q(**{f'{name}__{"lt" if desc else "gt"}': value})
+            equal &= Q(**{name: value})
+
+        # 第一个排序字段的范围条件，便于使用索引
+        name, desc = self.ordering[0]
+        return Q(**{f'{name}__{"lte" if desc else "gte"}': cursor[0]}) & seek
+
+    def encode_cursor(self, instance):
+        opts = instance._meta
+        values = [opts.get_field(name).value_to_string(instance) for name, _ in self.ordering]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            assert isinstance(values, list) and len(values) == len(self.ordering)
+            return [model._meta.get_field(name).to_python(value) for (name, _), value in zip(self.ordering, values)]
+        except (TypeError, ValueError, AssertionError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
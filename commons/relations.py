@@ -0,0 +1,114 @@
+from operator import attrgetter
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.utils.functional import cached_property
+from django_redis import get_redis_connection
+
+from commons.constants import CacheKeySet
+
+
+class Relation:
+
+    def __init__(self, through, viewer_field, object_field, get_viewer_id):
+        """
+        Args:
+            through (str): 中间模型
+            viewer_field (str): 中间模型中指向当前用户的字段
+            object_field (str): 中间模型中指向对象的字段
+            get_viewer_id (callable): 从中间模型实例中取出当前用户主键
+        """
+        self.through = through
+        self.viewer_field = viewer_field
+        self.object_field = object_field
+        self.get_viewer_id = get_viewer_id
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.through)
+
+    def get_queryset(self, viewer_id, ct_id):
+        lookups = {self.viewer_field: viewer_id, 'content_type': ct_id}
+        return self.model._default_manager.filter(**lookups).order_by().values_list(self.object_field, flat=True)
+
+
+RELATIONS = {
+    # 当前用户喜欢了对象
+    'liked': Relation('likes.Like', 'sender', 'object_id', attrgetter('sender_id')),
+    # 当前用户关注了对象
+    'following': Relation('follows.Follow', 'sender', 'object_id', attrgetter('sender_id')),
+    # 对象(用户)关注了当前用户
+    'followed': Relation('follows.Follow', 'object_id', 'sender', attrgetter('object_id')),
+    # 当前用户的收藏夹收藏了对象
+    'collected': Relation('collects.Collect', 'collection__owner', 'object_id', attrgetter('collection.owner_id')),
+}
+
+
+class ViewerRelations:
+    """
+    当前用户与一页对象之间的关系，每种关系对整页只查询一次 `IN (...)`
+
+    开启 `VIEWER_RELATIONS['CACHE_ENABLED']` 后，当前用户的关系集合缓存在 Redis 集合中，
+    并在中间模型写入或删除时失效。
+
+    Sample:
+    ```python
+        liked = ViewerRelations(request.user).resolve('liked', articles)
+        [article.pk in liked for article in articles]
+    ```
+    """
+
+    # 空集合的占位成员，用来区分空集合与未缓存
+    placeholder = '-'
+
+    def __init__(self, user):
+        self.user = user
+
+    def resolve(self, relation, objects):
+        """返回与当前用户存在关系的对象主键集合"""
+        pks = [obj.pk for obj in objects]
+        if not pks or self.user is None or not self.user.is_authenticated:
+            return set()
+
+        ct_id = ContentType.objects.get_for_model(objects[0]).pk
+        if settings.VIEWER_RELATIONS['CACHE_ENABLED']:
+            return self._resolve_cached(RELATIONS[relation], relation, ct_id, pks)
+
+        queryset = RELATIONS[relation].get_queryset(self.user.pk, ct_id)
+        return set(queryset.filter(**{f'{RELATIONS[relation].object_field}__in': pks}))
+
+    def _resolve_cached(self, spec, relation, ct_id, pks):
+        conn = get_redis_connection()
+        key = CacheKeySet.VIEWER_RELATION.format(relation=relation, uid=self.user.pk, ct=ct_id)
+
+        pipe = conn.pipeline()
+        pipe.exists(key)
+        pipe.smismember(key, pks)
+        exists, hits = pipe.execute()
+        if exists:
+            return {pk for pk, hit in zip(pks, hits) if hit}
+
+        # 关系过多的用户不缓存，直接查询数据库
+        limit = settings.VIEWER_RELATIONS['CACHE_MAX_MEMBERS']
+        members = list(spec.get_queryset(self.user.pk, ct_id)[:limit + 1])
+        if len(members) <= limit:
+            pipe = conn.pipeline()
+            pipe.sadd(key, self.placeholder, *members)
+            pipe.expire(key, settings.VIEWER_RELATIONS['CACHE_TIMEOUT'])
+            pipe.execute()
+            return set(members) & set(pks)
+
+        return set(spec.get_queryset(self.user.pk, ct_id).filter(**{f'{spec.object_field}__in': pks}))
+
+
+def invalidate_viewer_relations(sender, instance, **kwargs):
+    """中间模型写入或删除后，清除相关用户的关系缓存"""
+    if not settings.VIEWER_RELATIONS['CACHE_ENABLED']:
+        return
+
+    keys = [
+        CacheKeySet.VIEWER_RELATION.format(relation=relation, uid=spec.get_viewer_id(instance), ct=instance.content_type_id)
+        for relation, spec in RELATIONS.items() if spec.through == sender._meta.label
+    ]
+    get_redis_connection().delete(*keys)
@@ -0,0 +1,88 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from markdown import Markdown
+
+from commons.constants import CacheKeySet
+
+EXTENSIONS = ['fenced_code', 'codehilite']
+
+# 正文较长时在后台渲染，渲染完成之前展示的内容
+PLACEHOLDER = '<p>正在渲染...</p>'
+
+_local = threading.local()
+
+
+def get_markdown():
+    """每个线程复用一个 Markdown 实例，避免每次重新加载扩展"""
+    md = getattr(_local, 'markdown', None)
+    if md is None:
+        md = _local.markdown = Markdown(extensions=EXTENSIONS)
+    return md.reset()
+
+
+def get_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def get_cached(text):
+    return cache.get(CacheKeySet.MARKDOWN.format(hash=get_hash(text)))
+
+
+def render(text):
+    """渲染 Markdown，结果按内容哈希缓存"""
+    key = CacheKeySet.MARKDOWN.format(hash=get_hash(text))
+    html = cache.get(key)
+    if html is None:
+        html = get_markdown().convert(text)
+        cache.set(key, html, settings.MARKDOWN['CACHE_TIMEOUT'].total_seconds())
+    return html
+
+
+class MarkdownMixin:
+    """
+    保存时将 `markdown_field` 渲染到 `html_field`
+
+    正文与从数据库读取时相同则不重新渲染，超过 `MARKDOWN['ASYNC_THRESHOLD']`
+    的正文在事务提交后交给 Celery 渲染，期间 `html_field` 为空。
+    """
+    markdown_field = 'body'
+    html_field = 'body_html'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rendered_text = instance.__dict__.get(cls.markdown_field)
+        return instance
+
+    @property
+    def rendered_html(self):
+        return getattr(self, self.html_field) or PLACEHOLDER
+
+    def save(self, *args, **kwargs):
+        text = getattr(self, self.markdown_field)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.markdown_field not in update_fields:
+            return super().save(*args, **kwargs)
+
+        if text != getattr(self, '_rendered_text', None) or not getattr(self, self.html_field):
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, self.html_field}
+
+            html = get_cached(text)
+            if html is None and len(text) <= settings.MARKDOWN['ASYNC_THRESHOLD']:
+                html = render(text)
+            setattr(self, self.html_field, html or '')
+            super().save(*args, **kwargs)
+
+            if html is None:
+                from commons.tasks import render_markdown
+                label, pk = self._meta.label, self.pk
+                transaction.on_commit(lambda: render_markdown.delay(label, pk))
+        else:
+            super().save(*args, **kwargs)
+
+        self._rendered_text = text
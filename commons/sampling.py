@@ -0,0 +1,138 @@
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.expressions import F, RawSQL, Value
+from django.db.models.fields import FloatField
+from django.db.models.functions import Cast, NullIf, Power, Random
+from django.db.models.signals import post_delete, post_save
+
+from commons.utils import random
+
+# 每个进程缓存的主键数组，{(db, table, sql): (expires, ids)}，最近最少使用的先淘汰
+_id_cache = OrderedDict()
+
+# 每个进程缓存的表行数估计，{(db, table): (expires, rows)}
+_row_estimates = {}
+
+
+def _timeout(key):
+    return settings.SAMPLING[key].total_seconds()
+
+
+def get_ids(queryset):
+    """
+    查询集的全部主键，按查询语句缓存
+
+    整数主键保存为紧凑数组，千万行约占 80MB。最多缓存 `ID_CACHE_ENTRIES` 个查询，
+    所有查询的主键总数不超过 `ID_CACHE_MAX_SIZE`，过期的在写入新缓存时清除，超出时淘汰最久未用的。
+    """
+    model = queryset.model
+    queryset = queryset.order_by().values_list('pk', flat=True)
+    key = (queryset.db, model._meta.db_table, str(queryset.query))
+    now = time.monotonic()
+    expires, ids = _id_cache.get(key, (0, None))
+    if expires > now:
+        _id_cache.move_to_end(key)
+        return ids
+
+    ids = list(queryset)
+    if ids and all(isinstance(pk, int) for pk in ids):
+        ids = array('q', ids)
+    if 0 < len(ids) <= settings.SAMPLING['ID_CACHE_MAX_SIZE']:
+        watch(model)
+        _id_cache[key] = (now + _timeout('ID_CACHE_TIMEOUT'), ids)
+        _id_cache.move_to_end(key)
+    else:
+        _id_cache.pop(key, None)
+
+    for expired in [k for k, (expires, _) in _id_cache.items() if expires <= now]:
+        _id_cache.pop(expired, None)
+    total = sum(len(cached) for _, cached in _id_cache.values())
+    while len(_id_cache) > settings.SAMPLING['ID_CACHE_ENTRIES'] or total > settings.SAMPLING['ID_CACHE_MAX_SIZE']:
+        _, (_, evicted) = _id_cache.popitem(last=False)
+        total -= len(evicted)
+    return ids
+
+
+def get_row_estimate(queryset):
+    """Postgres 统计信息中的表行数，不需要扫描全表"""
+    table = queryset.model._meta.db_table
+    key = (queryset.db, table)
+    expires, rows = _row_estimates.get(key, (0, None))
+    if expires > time.monotonic():
+        return rows
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+        row = cursor.fetchone()
+    rows = max(row[0], 0) if row else 0
+    _row_estimates[key] = (time.monotonic() + _timeout('ROW_ESTIMATE_TIMEOUT'), rows)
+    return rows
+
+
+def clear_ids(sender, **kwargs):
+    """新增或删除行后丢弃该表的主键缓存"""
+    if kwargs.get('created') is False or not _id_cache:
+        return
+    table = sender._meta.db_table
+    for key in [key for key in _id_cache if key[1] == table]:
+        _id_cache.pop(key, None)
+
+
+def watch(model):
+    """缓存过主键的模型才连接信号，重复连接时忽略"""
+    uid = f'commons.sampling.clear_ids.{model._meta.label_lower}'
+    post_save.connect(clear_ids, sender=model, dispatch_uid=uid)
+    post_delete.connect(clear_ids, sender=model, dispatch_uid=uid)
+
+
+def sample_ids(queryset, amount):
+    """从缓存的主键数组中无放回地均匀抽取，最终只有一次 `pk IN (...)` 查询"""
+    ids = get_ids(queryset)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=random.sample(ids, min(amount, len(ids))))
+
+
+def sample_table(queryset, amount):
+    """
+    Postgres `TABLESAMPLE BERNOULLI`，按估计行数计算抽样比例，适合无法缓存主键的大表
+
+    抽样比例放大 `TABLESAMPLE_OVERSAMPLE` 倍，抽样结果再随机截取，行数偶尔可能不足。
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return sample_ids(queryset, amount)
+
+    rows = get_row_estimate(queryset)
+    if rows <= 0:
+        return sample_ids(queryset, amount)
+
+    percent = min(100.0, 100.0 * amount * settings.SAMPLING['TABLESAMPLE_OVERSAMPLE'] / rows)
+    qn = connection.ops.quote_name
+    opts = queryset.model._meta
+    sql = f'SELECT {qn(opts.pk.column)} FROM {qn(opts.db_table)} TABLESAMPLE BERNOULLI (%s)'
+    return queryset.filter(pk__in=RawSQL(sql, [percent])).order_by('?')[:amount]
+
+
+def sample_weighted(queryset, amount, weight):
+    """
+    加权无放回抽样(Efraimidis-Spirakis)，每行的键为 `random() ^ (1 / weight)`，取最大的若干行
+
+    权重为 0 的行键为 NULL，排在最后。
+    """
+    if not weight:
+        raise ValueError('Weighted sampling requires a weight field.')
+    weight = Cast(NullIf(F(weight), Value(0)), FloatField())
+    key = Power(Random(), Value(1.0) / weight)
+    return queryset.alias(_sampling_key=key).order_by(F('_sampling_key').desc(nulls_last=True))[:amount]
+
+
+SAMPLERS = {
+    'ids': sample_ids,
+    'tablesample': sample_table,
+    'weighted': sample_weighted,
+}
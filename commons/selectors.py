@@ -1,22 +1,20 @@
+import math
 from functools import partial
 
 from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
-from django.db.models.aggregates import Count
-from django.db.models.expressions import Case, When, Value, Col
-from django.db.models.fields import BooleanField
-from django.db.models.sql.constants import LOUTER
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from collects.serializers import CollectionSerializer
 from comments.serializers import CommentSerializer
-from commons.decorators import paginate, add_query
-from commons.managers import GenericJoin
-from follows.models import Follow
-from likes.models import Like
+from commons.decorators import paginate
+from commons.pagination import KeysetPagination
 from oauth.serializers import UserSerializer
 from polls.serializers import QuestionSerializer
 from taggit.serializers import TagSerializer
-from weblog.models import Article
+from timeline import feeds
+from weblog.models import Article, Post
 from weblog.serializers import ArticleSerializer, PostSerializer, CategorySerializer, TopicSerializer
 
 UserModel = get_user_model()
@@ -28,290 +26,260 @@ def is_expanded(request, field):
     return field in expand_fields
 
 
-def add_is_following(queryset, request):
-    # 是否被当前用户关注
-    ct = ContentType.objects.get_for_model(queryset.model)
-    join_cols = (('id', 'object_id'),)
-    extra_conds = (('content_type', ct.pk), ('sender', request.user.pk))
-    join = GenericJoin(queryset.model, Follow, LOUTER, join_cols, extra_conds=extra_conds)
-    alias = queryset.query.join(join)
-    queryset = queryset.alias(following_id=Col(alias, Follow._meta.pk)) \
-        .annotate(is_following=Case(
-            When(following_id__isnull=True, then=Value(False)), default=Value(True), output_field=BooleanField())
-    )
-    return queryset
-
-
-def add_is_followed(queryset, request):
-    # 是否关注了当前用户
-    ct = ContentType.objects.get_for_model(queryset.model)
-    join_cols = (('id', 'sender_id'),)
-    extra_conds = (('content_type', ct.pk), ('object_id', request.user.pk))
-    join = GenericJoin(queryset.model, Follow, LOUTER, join_cols, extra_conds=extra_conds)
-    alias = queryset.query.join(join)
-    queryset = queryset.alias(followed_id=Col(alias, Follow._meta.pk)) \
-        .annotate(is_followed=Case(
-            When(followed_id__isnull=True, then=Value(False)),
-            default=Value(True),
-            output_field=BooleanField()
-        ))
-    return queryset
-
-
-def add_is_liked(queryset, request):
-    # 是否被当前用户喜欢
-    ct = ContentType.objects.get_for_model(queryset.model)
-    join_cols = (('id', 'object_id'),)
-    extra_conds = (('content_type', ct.pk), ('sender', request.user.pk))
-    join = GenericJoin(queryset.model, Like, LOUTER, join_cols, extra_conds=extra_conds)
-    alias = queryset.query.join(join)
-    queryset = queryset.alias(like_id=Col(alias, Like._meta.pk)) \
-        .annotate(is_liked=Case(
-            When(like_id__isnull=True, then=Value(False)),
-            default=Value(True),
-            output_field=BooleanField()
-        ))
-    return queryset
-
-
 def select_article(queryset, request):
     queryset = queryset.filter(status=Article.Status.PUBLISHED)
 
-    # 是否被当前用户喜欢
-    queryset = add_is_liked(queryset, request)
-
     # 增加属性字段
-    queryset = queryset.annotate(
-        like_count=Count('likes'),
-        comment_count=Count('comments'),
-        collect_count=Count('collects')) \
+    queryset = queryset.with_counters('like_count', 'comment_count', 'collect_count') \
         .select_related('author__profile', 'category') \
         .prefetch_related('topics')
 
+    # 扩展的标签和喜欢的人，整页每个关联两次查询
+    queryset = queryset.prefetch_generic(*(name for name in ('tags', 'likers') if is_expanded(request, name)))
+
     return queryset
 
 
 def select_post(queryset, request):
-    queryset = queryset.filter(pk__isnull=False)
-
-    # 是否被当前用户喜欢
-    queryset = add_is_liked(queryset, request)
-
     # 增加属性字段
-    queryset = queryset.annotate(
-        like_count=Count('likes'),
-        comment_count=Count('comments'),
-        collect_count=Count('collects')) \
+    queryset = queryset.with_counters('like_count', 'comment_count', 'collect_count') \
         .select_related('author__profile')
 
+    # 扩展的喜欢的人，整页两次查询
+    if is_expanded(request, 'likers'):
+        queryset = queryset.prefetch_generic('likers')
+
     return queryset
 
 
 def select_user(queryset, request):
     queryset = queryset.filter(is_active=True).select_related('profile')
 
-    # 是否被当前用户关注
-    if is_expanded(request, 'is_following'):
-        queryset = add_is_following(queryset, request)
-
-    # 是否关注了当前用户
-    if is_expanded(request, 'is_followed'):
-        queryset = add_is_followed(queryset, request)
-
     # 文章数量
     if is_expanded(request, 'article_count'):
-        queryset = queryset.annotate(article_count=Count('articles'))
+        queryset = queryset.with_counts(article_count='articles')
 
     # 动态数量
     if is_expanded(request, 'post_count'):
-        queryset = queryset.annotate(post_count=Count('posts'))
+        queryset = queryset.with_counts(post_count='posts')
 
     return queryset
 
 
-@paginate(serializer_class=partial(UserSerializer, expand=['is_following', 'is_followed']))
-@add_query(query_func=add_is_followed)
-@add_query(query_func=add_is_following)
+@paginate(serializer_class=partial(UserSerializer, expand=['is_following', 'is_followed']), pagination_class=KeysetPagination)
 def user_following(view, instance, request):
     queryset = instance.following.all()
     queryset = select_user(queryset, request)
     return queryset
 
 
-@paginate(serializer_class=partial(UserSerializer, expand=['is_following', 'is_followed']))
-@add_query(query_func=add_is_followed)
-@add_query(query_func=add_is_following)
+@paginate(serializer_class=partial(UserSerializer, expand=['is_following', 'is_followed']), pagination_class=KeysetPagination)
 def user_followers(view, instance, request):
     queryset = instance.followers.all()
     queryset = select_user(queryset, request)
     return queryset
 
 
-@paginate(serializer_class=ArticleSerializer)
+@paginate(serializer_class=ArticleSerializer, pagination_class=KeysetPagination)
 def user_articles(view, instance, request):
     queryset = instance.articles.all()
     queryset = select_article(queryset, request)
     return queryset
 
 
-@paginate(serializer_class=PostSerializer)
+@paginate(serializer_class=PostSerializer, pagination_class=KeysetPagination)
 def user_posts(view, instance, request):
     queryset = instance.posts.all()
     queryset = select_post(queryset, request)
     return queryset
 
 
-@paginate(serializer_class=TagSerializer)
+def user_timeline(view, instance, request):
+    # 游标为 `时间戳:成员`，只有时间戳时跳过与其时间相同的全部内容
+    cursor = request.query_params.get('cursor') or None
+    if cursor is not None:
+        score, _, member = cursor.partition(':')
+        try:
+            score = float(score)
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        # `nan`、`inf` 等无法转换为时间
+        if not math.isfinite(score):
+            raise NotFound('Invalid cursor')
+        cursor = (score, member)
+
+    members, next_cursor = feeds.read(instance.pk, cursor)
+
+    # 每种内容各查询一次
+    results = {}
+    for queryset, serializer_class in (
+        (select_article(Article.objects.all(), request), ArticleSerializer),
+        (select_post(Post.objects.all(), request), PostSerializer)
+    ):
+        label = queryset.model._meta.label_lower
+        pks = [member.split(':')[1] for member in members if member.startswith(f'{label}:')]
+        if pks:
+            serializer = serializer_class(queryset.filter(pk__in=pks), many=True, context=view.get_serializer_context())
+            results.update((f'{label}:{item["id"]}', item) for item in serializer.data)
+
+    url = request.build_absolute_uri()
+    return Response({
+        'next': next_cursor and replace_query_param(url, 'cursor', '{!r}:{}'.format(*next_cursor)),
+        'results': [results[member] for member in members if member in results]
+    })
+
+
+@paginate(serializer_class=TagSerializer, pagination_class=KeysetPagination)
 def user_tags(view, instance, request):
     queryset = instance.tags.all()
     return queryset
 
 
-@paginate(serializer_class=QuestionSerializer)
+@paginate(serializer_class=QuestionSerializer, pagination_class=KeysetPagination)
 def user_questions(view, instance, request):
     queryset = instance.questions.all()
     return queryset
 
 
-@paginate(serializer_class=CommentSerializer)
+@paginate(serializer_class=CommentSerializer, pagination_class=KeysetPagination)
 def user_comments(view, instance, request):
     queryset = instance.comments.all()
     return queryset
 
 
-@paginate(serializer_class=CollectionSerializer)
+@paginate(serializer_class=CollectionSerializer, pagination_class=KeysetPagination)
 def user_collections(view, instance, request):
     queryset = instance.collections.all()
     return queryset
 
 
-@paginate(serializer_class=CollectionSerializer)
+@paginate(serializer_class=CollectionSerializer, pagination_class=KeysetPagination)
 def user_liking_collections(view, instance, request):
     queryset = instance.liking_collections.all()
     return queryset
 
 
-@paginate(serializer_class=CollectionSerializer)
+@paginate(serializer_class=CollectionSerializer, pagination_class=KeysetPagination)
 def user_following_collections(view, instance, request):
     queryset = instance.following_collections.all()
     return queryset
 
 
-@paginate(serializer_class=CommentSerializer)
+@paginate(serializer_class=CommentSerializer, pagination_class=KeysetPagination)
 def user_liking_comments(view, instance, request):
     queryset = instance.liking_comments.all()
     return queryset
 
 
-@paginate(serializer_class=ArticleSerializer)
+@paginate(serializer_class=ArticleSerializer, pagination_class=KeysetPagination)
 def user_liking_articles(view, instance, request):
-    queryset = instance.liking_articles.annotate(is_liked=Value(True, BooleanField()))
+    queryset = instance.liking_articles.all()
     return queryset
 
 
-@paginate(serializer_class=PostSerializer)
+@paginate(serializer_class=PostSerializer, pagination_class=KeysetPagination)
 def user_liking_posts(view, instance, request):
-    queryset = instance.liking_posts.annotate(is_liked=Value(True, BooleanField()))
+    queryset = instance.liking_posts.all()
     return queryset
 
 
-@paginate(serializer_class=CategorySerializer)
+@paginate(serializer_class=CategorySerializer, pagination_class=KeysetPagination)
 def user_following_categories(view, instance, request):
     queryset = instance.following_categories.all()
     return queryset
 
 
-@paginate(serializer_class=TopicSerializer)
+@paginate(serializer_class=TopicSerializer, pagination_class=KeysetPagination)
 def user_following_topics(view, instance, request):
     queryset = instance.following_topics.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def article_likers(view, instance, request):
     queryset = instance.likers.all()
     return queryset
 
 
-@paginate(serializer_class=CollectionSerializer)
+@paginate(serializer_class=CollectionSerializer, pagination_class=KeysetPagination)
 def article_collections(view, instance, request):
     queryset = instance.collections.all()
     return queryset
 
 
-@paginate(serializer_class=TagSerializer)
+@paginate(serializer_class=TagSerializer, pagination_class=KeysetPagination)
 def article_tags(view, instance, request):
     queryset = instance.tags.all()
     return queryset
 
 
-@paginate(serializer_class=TopicSerializer)
+@paginate(serializer_class=TopicSerializer, pagination_class=KeysetPagination)
 def article_topics(view, instance, request):
     queryset = instance.topics.all()
     return queryset
 
 
-@paginate(serializer_class=CommentSerializer)
+@paginate(serializer_class=CommentSerializer, pagination_class=KeysetPagination)
 def article_comments(view, instance, request):
     queryset = instance.comments.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def post_likers(view, instance, request):
     queryset = instance.likers.all()
     return queryset
 
 
-@paginate(serializer_class=CollectionSerializer)
+@paginate(serializer_class=CollectionSerializer, pagination_class=KeysetPagination)
 def post_collections(view, instance, request):
     queryset = instance.collections.all()
     return queryset
 
 
-@paginate(serializer_class=CommentSerializer)
+@paginate(serializer_class=CommentSerializer, pagination_class=KeysetPagination)
 def post_comments(view, instance, request):
     queryset = instance.comments.all()
     return queryset
 
 
-@paginate(serializer_class=ArticleSerializer)
+@paginate(serializer_class=ArticleSerializer, pagination_class=KeysetPagination)
 def collection_articles(view, instance, request):
     queryset = instance.articles.all()
     return queryset
 
 
-@paginate(serializer_class=PostSerializer)
+@paginate(serializer_class=PostSerializer, pagination_class=KeysetPagination)
 def collection_posts(view, instance, request):
     queryset = instance.posts.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def collection_likers(view, instance, request):
     queryset = instance.likers.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def collection_followers(view, instance, request):
     queryset = instance.followers.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def comment_likers(view, instance, request):
     queryset = instance.likers.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def category_followers(view, instance, request):
     queryset = instance.followers.all()
     return queryset
 
 
-@paginate(serializer_class=UserSerializer)
+@paginate(serializer_class=UserSerializer, pagination_class=KeysetPagination)
 def topic_followers(view, instance, request):
     queryset = instance.followers.all()
     return queryset
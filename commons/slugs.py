@@ -0,0 +1,72 @@
+import re
+
+from django.db import IntegrityError, router, transaction
+from django.db.models.aggregates import Count, Max
+from django.db.models.fields import BigIntegerField
+from django.db.models.functions import Cast, Substr
+from django.db.models.query_utils import Q
+from django.utils.text import slugify
+
+# 数字后缀的最大长度，连字符加上 18 位数字，不会超出 bigint
+SUFFIX_LENGTH = 19
+
+
+def unique_slugify(instance, value, slug_field='slug'):
+    """
+    生成唯一的 slug，已存在时在结尾加上最大数字后缀加一
+
+    一次查询同时得到原 slug 是否被占用以及已有的最大后缀，实例当前的 slug
+    仍然对应 `value` 时保持不变。
+
+    Args:
+        instance (Model instance): 实例对象
+        value (str): 生成 slug 的原文
+        slug_field (str): slug 字段名称
+    """
+    field = instance._meta.get_field(slug_field)
+    base = slugify(value, allow_unicode=True)[:field.max_length - SUFFIX_LENGTH]
+    pattern = rf'{re.escape(base)}-[0-9]{{1,18}}'
+
+    current = getattr(instance, field.attname)
+    if current and (current == base or re.fullmatch(pattern, current)):
+        return current
+
+    queryset = instance.__class__._default_manager.filter(**{f'{slug_field}__startswith': base})
+    if instance.pk is not None:
+        queryset = queryset.exclude(pk=instance.pk)
+
+    suffix = Cast(Substr(slug_field, len(base) + 2), BigIntegerField())
+    result = queryset.aggregate(
+        taken=Count('pk', filter=Q(**{slug_field: base})),
+        suffix=Max(suffix, filter=Q(**{f'{slug_field}__regex': f'^{pattern}$'}))
+    )
+    if not result['taken']:
+        return base
+    return f'{base}-{(result["suffix"] or 0) + 1}'
+
+
+class UniqueSlugMixin:
+    """
+    保存时根据 `slug_source` 字段生成唯一的 slug
+
+    并发保存生成相同的 slug 时会违反唯一约束，此时重新生成并重试。
+    """
+    slug_source = 'title'
+    slug_field = 'slug'
+    slug_retries = 3
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.slug_field not in update_fields:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        for retries in range(self.slug_retries, 0, -1):
+            setattr(self, self.slug_field, unique_slugify(self, getattr(self, self.slug_source), self.slug_field))
+            try:
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if retries == 1:
+                    raise
+                setattr(self, self.slug_field, '')
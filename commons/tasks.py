@@ -0,0 +1,16 @@
+from celery import shared_task
+from django.apps import apps
+
+from commons.rendering import render
+
+
+@shared_task
+def render_markdown(label, pk):
+    model = apps.get_model(label)
+    text = model._base_manager.filter(pk=pk).values_list(model.markdown_field, flat=True).first()
+    if text is None:
+        return
+
+    # 渲染期间正文被修改时放弃，由新的任务渲染
+    lookups = {'pk': pk, model.markdown_field: text}
+    model._base_manager.filter(**lookups).update(**{model.html_field: render(text)})
@@ -0,0 +1,48 @@
+import re
+import string
+
+from commons import hanzi
+
+# 英文标点、中文标点、空白和控制字符都是分隔符，只有 `-` 作为连字符保留在词中
+SEPARATORS = ''.join(sorted(
+    set(string.punctuation + hanzi.punctuation + string.whitespace + hanzi.basic_latin_control_characters) - {'-'}
+))
+
+TOKEN = re.compile('[^{}]+'.format(''.join(map(re.escape, SEPARATORS))))
+
+
+def tokenize(text):
+    """
+    中英文分词，连续的非分隔符为一个词
+
+    只由连字符组成的词丢弃，但位于文本末尾时保留，与逐字判断时的结果一致。
+    """
+    end = len(text)
+    for match in TOKEN.finditer(text):
+        token = match.group()
+        if token.strip('-') or match.end() == end:
+            yield token
+
+
+def tokenize_stream(fp, chunk_size=1 << 16):
+    """
+    按块读取文件分词，结果与一次读入全部文本相同
+
+    块末尾的词可能延续到下一块，留到下一块一起处理。
+    """
+    tail = ''
+    while chunk := fp.read(chunk_size):
+        text = tail + chunk
+        end = len(text)
+        for match in TOKEN.finditer(text):
+            if match.end() == end:
+                tail = match.group()
+                break
+            token = match.group()
+            if token.strip('-'):
+                yield token
+        else:
+            tail = ''
+
+    if tail:
+        yield tail
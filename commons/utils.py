@@ -11,6 +11,7 @@ from django.conf import settings
 from django.utils.timezone import is_naive, make_aware, utc
 
 from commons import hanzi
+from commons.tokenizer import tokenize
 
 random = secrets.SystemRandom()
 
@@ -148,15 +149,4 @@ def is_separator(char):
 
 def word_tokenize(text):
     """中英文分词"""
-    chars = []
-    for char in text:
-        if is_separator(char) and not is_hyphen(char):
-            if chars:
-                if not all(map(is_hyphen, chars)):
-                    yield ''.join(chars)
-                chars = []
-        else:
-            chars.append(char)
-
-    if chars:
-        yield ''.join(chars)
+    return tokenize(text)
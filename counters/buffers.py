@@ -0,0 +1,118 @@
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from commons.constants import CacheKeySet
+from commons.utils import chunks
+from counters.models import ViewFlush
+
+# 浏览量先累加在 Redis 中，定时批量写入数据库
+VIEW_MODELS = ['weblog.Article', 'oauth.Profile']
+
+
+def get_key(model):
+    return CacheKeySet.VIEW_COUNTS.format(label=model._meta.label_lower)
+
+
+def incr_views(obj, delta=1):
+    """
+    累加浏览量
+
+    Returns:
+        int: 尚未写入数据库的浏览量，包含本次
+    """
+    return get_redis_connection().hincrby(get_key(type(obj)), obj.pk, delta)
+
+
+def get_pending_views(model, pks):
+    """尚未写入数据库的浏览量，{pk: delta}"""
+    pks = list(pks)
+    if not pks:
+        return {}
+    values = get_redis_connection().hmget(get_key(model), pks)
+    return {pk: int(value or 0) for pk, value in zip(pks, values)}
+
+
+def apply_pending_views(instances):
+    """实例的 `view_count` 加上尚未写入数据库的浏览量，每个模型只读一次 Redis，已经加过的跳过"""
+    pending_instances = defaultdict(list)
+    for obj in instances:
+        if not hasattr(obj, '_pending_views') and 'view_count' not in obj.get_deferred_fields():
+            pending_instances[type(obj)].append(obj)
+
+    for model, objs in pending_instances.items():
+        pending = get_pending_views(model, [obj.pk for obj in objs])
+        for obj in objs:
+            obj.view_count += pending[obj.pk]
+            obj._pending_views = pending[obj.pk]
+
+
+def update_view_counts(model, deltas):
+    """一条 `UPDATE ... FROM (VALUES ...)` 写入一批浏览量"""
+    opts = model._meta
+    connection = connections[model._default_manager.db]
+    qn = connection.ops.quote_name
+    table, pk = qn(opts.db_table), qn(opts.pk.column)
+    values = ', '.join(['(%s, %s)'] * len(deltas))
+    sql = (
+        f'UPDATE {table} SET "view_count" = {table}."view_count" + v.delta '
+        f'FROM (VALUES {values}) AS v (pk, delta) WHERE {table}.{pk} = v.pk'
+    )
+    params = [value for pk_delta in deltas for value in pk_delta]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def flush_views(model, batch_size=1000):
+    """
+    将累加的浏览量写入数据库
+
+    先把累加的哈希表改名，之后的浏览量累加到新的哈希表中，互不影响。
+    整个过程持有 Redis 锁，同一模型同时只有一个写入。每个批次有唯一的编号，
+    编号与浏览量在同一事务中写入 `ViewFlush`，写入数据库后、删除哈希表前中断时，
+    下次执行发现编号已经写入，只删除哈希表，不会重复累加。
+
+    Returns:
+        int: 写入的行数，其他进程正在写入时为 0
+    """
+    conn = get_redis_connection()
+    key = get_key(model)
+    flushing = f'{key}:flushing'
+    token_key = f'{flushing}:token'
+    lock = conn.lock(f'{key}:lock', timeout=settings.VIEW_COUNTS['FLUSH_LOCK_TIMEOUT'].total_seconds())
+    if not lock.acquire(blocking=False):
+        return 0
+
+    try:
+        if not conn.exists(flushing):
+            try:
+                conn.rename(key, flushing)
+            except ResponseError:
+                # 没有新的浏览量
+                return 0
+
+        token = conn.get(token_key)
+        if token is None:
+            token = str(uuid.uuid4())
+            conn.set(token_key, token)
+        else:
+            token = token.decode()
+
+        deltas = [(int(pk), int(delta)) for pk, delta in conn.hgetall(flushing).items() if int(delta)]
+        with transaction.atomic(using=model._default_manager.db):
+            _, created = ViewFlush.objects.get_or_create(token=token, defaults={'label': model._meta.label})
+            if created:
+                for chunk in chunks(deltas, batch_size):
+                    update_view_counts(model, chunk)
+        conn.delete(flushing, token_key)
+
+        expired = timezone.now() - settings.VIEW_COUNTS['FLUSH_LOG_TIMEOUT']
+        ViewFlush.objects.filter(created__lt=expired).delete()
+        return len(deltas) if created else 0
+    finally:
+        lock.release()
@@ -0,0 +1,47 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models.aggregates import Count
+
+from counters.models import COUNTED_MODELS, Counter
+
+
+class Command(BaseCommand):
+    help = '根据动作表重新计算计数，并修正不一致的计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只报告不一致的计数，不写入')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for label, field in COUNTED_MODELS.items():
+            created, updated = self.reconcile(apps.get_model(label), field, options['dry_run'], options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{label} -> {field}: {created} created, {updated} updated'))
+
+    def reconcile(self, model, field, dry_run, batch_size):
+        # 已存储的计数
+        stored = {
+            (ct, oid): (pk, value)
+            for pk, ct, oid, value in Counter.objects.values_list('pk', 'content_type', 'object_id', field).iterator()
+        }
+
+        # 实际的计数
+        actual = model._base_manager.order_by().values('content_type', 'object_id') \
+            .annotate(count=Count('*')) \
+            .values_list('content_type', 'object_id', 'count')
+
+        to_create, to_update = [], []
+        for ct, oid, count in actual.iterator():
+            pk, value = stored.pop((ct, oid), (None, 0))
+            if pk is None:
+                to_create.append(Counter(content_type_id=ct, object_id=oid, **{field: count}))
+            elif value != count:
+                to_update.append(Counter(pk=pk, **{field: count}))
+
+        # 动作已全部删除的对象计数归零
+        to_update.extend(Counter(pk=pk, **{field: 0}) for pk, value in stored.values() if value != 0)
+
+        if not dry_run:
+            Counter.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+            Counter.objects.bulk_update(to_update, [field], batch_size=batch_size)
+
+        return len(to_create), len(to_update)
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='对象主键')),
+                ('like_count', models.PositiveIntegerField(default=0, verbose_name='喜欢数')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='评论数')),
+                ('collect_count', models.PositiveIntegerField(default=0, verbose_name='收藏数')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='关注数')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='内容类型')),
+            ],
+            options={
+                'verbose_name': '计数',
+                'verbose_name_plural': '计数',
+                'ordering': ['id'],
+                'get_latest_by': 'id',
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
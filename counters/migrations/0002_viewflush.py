@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewFlush',
+            fields=[
+                ('token', models.UUIDField(primary_key=True, serialize=False, verbose_name='批次')),
+                ('label', models.CharField(max_length=100, verbose_name='模型')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='写入时间')),
+            ],
+            options={
+                'verbose_name': '浏览量批次',
+                'verbose_name_plural': '浏览量批次',
+                'ordering': ['created'],
+                'get_latest_by': 'created',
+            },
+        ),
+    ]
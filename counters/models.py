@@ -0,0 +1,85 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models.expressions import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+
+# 动作模型 -> 目标对象上对应的计数字段
+COUNTED_MODELS = {
+    'likes.Like': 'like_count',
+    'comments.Comment': 'comment_count',
+    'collects.Collect': 'collect_count',
+    'follows.Follow': 'follower_count',
+}
+
+
+class CounterManager(models.Manager):
+
+    def incr(self, content_type_id, object_id, field, delta=1):
+        """原子地增减计数，计数行不存在时先创建"""
+        lookups = {'content_type_id': content_type_id, 'object_id': object_id}
+        value = Greatest(F(field) + delta, Value(0))
+        with transaction.atomic(using=self.db):
+            if not self.filter(**lookups).update(**{field: value}):
+                self.bulk_create([self.model(**lookups)], ignore_conflicts=True)
+                self.filter(**lookups).update(**{field: value})
+
+    def get_value(self, obj, field):
+        ct = ContentType.objects.get_for_model(obj)
+        value = self.filter(content_type=ct, object_id=obj.pk).values_list(field, flat=True).first()
+        return value or 0
+
+
+class Counter(models.Model):
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name='内容类型')
+    object_id = models.PositiveIntegerField(verbose_name='对象主键')
+    content_object = GenericForeignKey(ct_field='content_type', fk_field='object_id')
+    like_count = models.PositiveIntegerField('喜欢数', default=0)
+    comment_count = models.PositiveIntegerField('评论数', default=0)
+    collect_count = models.PositiveIntegerField('收藏数', default=0)
+    follower_count = models.PositiveIntegerField('关注数', default=0)
+
+    objects = CounterManager()
+
+    class Meta:
+        ordering = ['id']
+        get_latest_by = 'id'
+        verbose_name = '计数'
+        verbose_name_plural = verbose_name
+        unique_together = [['content_type', 'object_id']]
+
+    def __str__(self):
+        return f'{self.content_type.model}:{self.object_id}'
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        field = COUNTED_MODELS[sender._meta.label]
+        Counter.objects.incr(instance.content_type_id, instance.object_id, field, 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    field = COUNTED_MODELS[sender._meta.label]
+    Counter.objects.incr(instance.content_type_id, instance.object_id, field, -1)
+
+
+for label in COUNTED_MODELS:
+    post_save.connect(count_created, sender=label)
+    post_delete.connect(count_deleted, sender=label)
+
+
+class ViewFlush(models.Model):
+    """已经写入数据库的浏览量批次，与浏览量在同一事务中写入，重复执行同一批次时跳过"""
+    token = models.UUIDField('批次', primary_key=True)
+    label = models.CharField('模型', max_length=100)
+    created = models.DateTimeField('写入时间', auto_now_add=True, editable=False, db_index=True)
+
+    class Meta:
+        ordering = ['created']
+        get_latest_by = 'created'
+        verbose_name = '浏览量批次'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return f'{self.label}:{self.token}'
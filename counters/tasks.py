@@ -0,0 +1,11 @@
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+
+from counters.buffers import VIEW_MODELS, flush_views
+
+
+@shared_task
+def flush_view_counts():
+    batch_size = settings.VIEW_COUNTS['FLUSH_BATCH_SIZE']
+    return {label: flush_views(apps.get_model(label), batch_size) for label in VIEW_MODELS}
@@ -2,15 +2,15 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models.signals import post_delete, post_save
+
+from commons.relations import ViewerRelations, invalidate_viewer_relations
 
 
 class FollowManager(models.Manager):
 
     def is_followed(self, user, obj):
-        if not user.is_authenticated:
-            return False
-
-        return self.filter(sender=user, content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk).exists()
+        return obj.pk in ViewerRelations(user).resolve('following', [obj])
 
 
 class Follow(models.Model):
@@ -40,3 +40,7 @@ class Follow(models.Model):
 
     def is_owned(self, user):
         return self.sender == user
+
+
+post_save.connect(invalidate_viewer_relations, sender=Follow)
+post_delete.connect(invalidate_viewer_relations, sender=Follow)
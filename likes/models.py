@@ -2,15 +2,15 @@ from django.db import models
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.db.models.signals import post_delete, post_save
+
+from commons.relations import ViewerRelations, invalidate_viewer_relations
 
 
 class LikeManager(models.Manager):
 
     def is_liked(self, user, obj):
-        if not user.is_authenticated:
-            return False
-
-        return self.filter(sender=user, content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk).exists()
+        return obj.pk in ViewerRelations(user).resolve('liked', [obj])
 
     def get_user_likes(self, user, content_type):
         return self.filter(sender=user, content_type=content_type)
@@ -43,3 +43,7 @@ class Like(models.Model):
 
     def is_owned(self, user):
         return self.sender == user
+
+
+post_save.connect(invalidate_viewer_relations, sender=Like)
+post_delete.connect(invalidate_viewer_relations, sender=Like)
@@ -1,10 +1,11 @@
 from django.conf import settings
-from django.contrib.auth import get_user_model
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
 from commons.constants import Messages
 from commons.utils import aware_utcnow, make_timestamp
+from oauth.backends import token_backend
+from oauth.caches import get_user_snapshot
 from oauth.models import TokenUser
 from oauth.tokens import AccessToken
 
@@ -20,8 +21,12 @@ class TokenAuthentication(BaseAuthentication):
         validated_token = self.get_validated_token(raw_token, request)
         user = self.get_user(validated_token)
 
-        # 认证成功，记录本次请求时间
-        request.session['last_seen'] = make_timestamp(aware_utcnow())
+        # 认证成功，记录本次请求时间。与上次记录的间隔不足 LAST_SEEN_GRANULARITY 时不写入，
+        # 避免每次请求都写回 session，续期判断因此最多有 LAST_SEEN_GRANULARITY 的误差。
+        current_time = make_timestamp(aware_utcnow())
+        granularity = settings.OAUTH['LAST_SEEN_GRANULARITY'].total_seconds()
+        if current_time - request.session.get('last_seen', 0) >= granularity:
+            request.session['last_seen'] = current_time
 
         return user, validated_token
 
@@ -30,8 +35,11 @@ class TokenAuthentication(BaseAuthentication):
 
     def get_validated_token(self, raw_token, request):
         try:
-            # 不校验token获取负载信息
-            token = AccessToken(raw_token, verify=False)
+            # 使用中间件解析好的token，签名校验结果有缓存
+            token = getattr(request, 'token', None)
+            if token is None or token.raw_token != raw_token:
+                token = AccessToken(raw_token, verify=False)
+            assert token_backend.verify_signature(raw_token), Messages.INVALID_SIGNATURE
 
             # 每次登入生成新的token，为了使旧的token失效但是不想在后端存储token，将新生成的token_id记录在session中。
             # 每次请求过来时，从负载payload中获取token_id，并和session中的token_id进行对比，不相同则认证失败。
@@ -65,10 +73,8 @@ class TokenAuthentication(BaseAuthentication):
         except KeyError:
             raise AuthenticationFailed(Messages.UNKNOWN_UID)
 
-        user_model = get_user_model()
-        try:
-            user = user_model.objects.get(**{settings.OAUTH['USER_ID_FIELD']: user_id})
-        except user_model.DoesNotExist:
+        user = get_user_snapshot(user_id)
+        if user is None:
             raise AuthenticationFailed(Messages.USER_NOT_FOUND)
 
         if not user.is_active:
@@ -1,3 +1,5 @@
+import functools
+
 import jwt
 from django.conf import settings
 from jwt import algorithms
@@ -15,12 +17,15 @@ class TokenBackend:
         verifying_key=None,
         audience=None,
         issuer=None,
+        verified_cache_size=4096,
     ):
         self.algorithm = self._validate_algorithm(algorithm)
         self.verifying_key = signing_key if algorithm.startswith('HS') else verifying_key
         self.signing_key = signing_key
         self.audience = audience
         self.issuer = issuer
+        # 最近校验过签名的token，有效期内重复请求不再计算签名
+        self.verify_signature = functools.lru_cache(maxsize=verified_cache_size)(self._verify_signature)
 
     def _validate_algorithm(self, algorithm):
         assert algorithm in self.ALLOWED_ALGORITHMS, Messages.UNKNOWN_ALGORITHM.format(algorithm)
@@ -56,11 +61,34 @@ class TokenBackend:
             }
         )
 
+    def _verify_signature(self, token):
+        """只校验签名、受众和签发者，时间相关的声明由 `Token.verify` 校验"""
+        try:
+            jwt.decode(
+                token,
+                self.verifying_key,
+                algorithms=[self.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_iss': self.issuer is not None,
+                    'verify_exp': False,
+                    'verify_iat': False,
+                    'verify_nbf': False,
+                    'verify_signature': True
+                }
+            )
+            return True
+        except jwt.InvalidTokenError:
+            return False
+
 
 token_backend = TokenBackend(
     'HS256',
     signing_key=settings.SECRET_KEY,
     verifying_key=None,
     audience=None,
-    issuer=None
+    issuer=None,
+    verified_cache_size=settings.OAUTH['VERIFIED_TOKEN_CACHE_SIZE']
 )
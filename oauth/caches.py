@@ -0,0 +1,67 @@
+import pickle
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from commons.constants import CacheKeySet
+
+# 进程内缓存，{user_id: (expires, data)}，保存序列化后的数据，每次读取得到新的实例
+_local = OrderedDict()
+
+
+def get_key(user_id):
+    return CacheKeySet.USER_SNAPSHOT.format(uid=user_id)
+
+
+def get_user_snapshot(user_id):
+    """
+    用户及其个人资料的快照，依次从进程内、Redis、数据库中读取
+
+    Returns:
+        User: 用户不存在时返回 None
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return pickle.loads(entry[1])
+
+    key = get_key(user_id)
+    data = cache.get(key)
+    if data is None:
+        user_model = get_user_model()
+        user = user_model.objects.select_related('profile').filter(**{settings.OAUTH['USER_ID_FIELD']: user_id}).first()
+        if user is None:
+            return None
+        data = pickle.dumps(user)
+        cache.set(key, data, settings.OAUTH['USER_CACHE_TIMEOUT'].total_seconds())
+
+    _local[user_id] = (now + settings.OAUTH['USER_CACHE_LOCAL_TIMEOUT'].total_seconds(), data)
+    _local.move_to_end(user_id)
+    while len(_local) > settings.OAUTH['USER_CACHE_LOCAL_SIZE']:
+        _local.popitem(last=False)
+
+    return pickle.loads(data)
+
+
+def invalidate_user_snapshot(user_id):
+    """删除快照，事务提交后再删除一次，避免提交前被并发请求写回旧数据"""
+    def invalidate():
+        _local.pop(user_id, None)
+        cache.delete(get_key(user_id))
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_snapshot(getattr(instance, settings.OAUTH['USER_ID_FIELD']))
+
+
+def profile_changed(sender, instance, **kwargs):
+    user_id_field = settings.OAUTH['USER_ID_FIELD']
+    user_id = instance.user_id if user_id_field == 'id' else getattr(instance.user, user_id_field)
+    invalidate_user_snapshot(user_id)
@@ -5,10 +5,10 @@ from django.contrib.sessions.middleware import SessionMiddleware
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.utils.encoding import force_bytes
-from django_redis import get_redis_connection
 from rest_framework.authentication import get_authorization_header
 
 from commons.utils import make_timestamp, aware_utcnow
+from oauth.nonces import nonce_store
 from oauth.tokens import AccessToken
 
 
@@ -23,17 +23,35 @@ def get_authorization_token(request):
         return None
 
 
+def get_unverified_token(raw_token):
+    """解析token但不校验，解析失败返回None"""
+    if raw_token is None:
+        return None
+    try:
+        return AccessToken(raw_token, verify=False)
+    except Exception:
+        return None
+
+
 class TokenMiddleware(SessionMiddleware):
     def process_request(self, request):
+        # 每个请求只解析一次token，认证时直接使用
         request.raw_token = get_authorization_token(request)
-        try:
-            session_key = AccessToken(request.raw_token, verify=False)[settings.SESSION_COOKIE_NAME]
-        except:
+        request.token = get_unverified_token(request.raw_token)
+        if request.token is not None and settings.SESSION_COOKIE_NAME in request.token:
+            session_key = request.token[settings.SESSION_COOKIE_NAME]
+        else:
             session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
         request.session = self.SessionStore(session_key)
 
 
 class NonceMiddleware(MiddlewareMixin):
+    """
+    防重放，请求头 `Nonce: {timestamp}.{nonce}.{signature}`，签名密钥为登录时写入 session 的随机值
+
+    需要放在 `TokenMiddleware` 之后，未登录的 session 没有密钥，不做校验。
+    """
+
     def get_nonce(self, request):
         nonce = request.META.get('HTTP_NONCE', b'')
         if isinstance(nonce, str):
@@ -41,21 +59,29 @@ class NonceMiddleware(MiddlewareMixin):
         return nonce
 
     def process_request(self, request):
-        conn = get_redis_connection()
+        secret_key = request.session.get('_')
+        if secret_key is None:
+            return None
+
         raw_nonce = self.get_nonce(request)
-        timestamp, nonce, signature = raw_nonce.decode().split('.')
-        secret_key = request.session['_']
+        try:
+            timestamp, nonce, signature = raw_nonce.decode().split('.')
+            timestamp = int(timestamp)
+        except (UnicodeDecodeError, ValueError):
+            return JsonResponse({'nonce': 'nonce invalid'})
+
         # 验证签名
-        if hmac.new(force_bytes(secret_key), raw_nonce, 'md5').hexdigest() != signature:
+        message = f'{timestamp}.{nonce}'.encode()
+        # 按字节比较，签名含非 ASCII 字符时 `compare_digest` 比较字符串会抛出 TypeError
+        digest = hmac.new(force_bytes(secret_key), message, 'md5').hexdigest().encode()
+        if not hmac.compare_digest(digest, force_bytes(signature)):
             return JsonResponse({'nonce': 'signature failed'})
 
         # 验证时间戳
         current_time = make_timestamp(aware_utcnow())
-        if not (0 <= current_time - int(timestamp) <= 60):
+        if not (0 <= current_time - timestamp <= settings.OAUTH['NONCE_WINDOW'].total_seconds()):
             return JsonResponse({'nonce': 'timestamp failed'})
 
         # 验证唯一值
-        if conn.sismember('nonce', nonce):
+        if not nonce_store.add(nonce, timestamp):
             return JsonResponse({'nonce': 'nonce exist'})
-
-        conn.sadd('nonce', nonce)
@@ -5,15 +5,17 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager as _UserManager
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models.expressions import F
 from django.db.models.manager import EmptyManager
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.utils import timezone
 from django.utils.functional import cached_property
 
 from commons.fields.models import PhoneField
 from commons.managers import GenericQuerySet, ManagerDescriptor, GenericRelatedManager, GenericReversedManager
 from commons.utils import get_random_name
+from counters.buffers import incr_views
+from oauth.caches import get_user_snapshot, profile_changed, user_changed
+from counters.models import Counter
 
 
 def _username_mtime():
@@ -26,8 +28,8 @@ def _nickname_mtime():
 
 class UserManager(_UserManager):
 
-    def random(self, amount=1):
-        return self.get_queryset().random(amount=amount)
+    def random(self, amount=1, mode='ids', weight=None):
+        return self.get_queryset().random(amount=amount, mode=mode, weight=weight)
 
     def get_queryset(self):
         return GenericQuerySet(self.model, using=self._db)
@@ -95,7 +97,7 @@ class User(AbstractUser):
 
     @property
     def follower_count(self):
-        return self.followers.count()
+        return Counter.objects.get_value(self, 'follower_count')
 
     def is_owned(self, user):
         return self == user
@@ -163,9 +165,9 @@ class Profile(models.Model):
         super().save(*args, **kwargs)
 
     def viewed(self):
-        self.view_count = F('view_count') + 1
-        self.save(update_fields=['view_count'])
-        self.refresh_from_db()
+        pending = incr_views(self)
+        self.view_count += pending - getattr(self, '_pending_views', 0)
+        self._pending_views = pending
 
     def is_owned(self, user):
         return self.user == user
@@ -198,6 +200,10 @@ def create_profile(sender, **kwargs):
 
 
 post_save.connect(create_profile, sender=User)
+post_save.connect(user_changed, sender=User)
+post_delete.connect(user_changed, sender=User)
+post_save.connect(profile_changed, sender=Profile)
+post_delete.connect(profile_changed, sender=Profile)
 
 
 class Region(models.Model):
@@ -239,6 +245,16 @@ class TokenUser:
     def __init__(self, token):
         self.token = token
 
+    @cached_property
+    def snapshot(self):
+        return get_user_snapshot(self.id)
+
+    def get_claim(self, claim, default):
+        """优先从token中读取，没有时从用户快照中读取"""
+        if claim in self.token:
+            return self.token[claim]
+        return getattr(self.snapshot, claim, default)
+
     def __repr__(self):
         return f'<{self.__class__.__name__}: {self}>'
 
@@ -255,15 +271,15 @@ class TokenUser:
 
     @cached_property
     def username(self):
-        return self.token.get('username', '')
+        return self.get_claim('username', '')
 
     @cached_property
     def is_staff(self):
-        return self.token.get('is_staff', False)
+        return self.get_claim('is_staff', False)
 
     @cached_property
     def is_superuser(self):
-        return self.token.get('is_superuser', False)
+        return self.get_claim('is_superuser', False)
 
     def __eq__(self, other):
         return self.id == other.id
@@ -0,0 +1,88 @@
+import hashlib
+import math
+import threading
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from commons.constants import CacheKeySet
+
+
+class BloomFilter:
+    """
+    布隆过滤器，只会误判已存在，不会漏判
+
+    Args:
+        capacity (int): 预计元素个数
+        error_rate (float): 误判率
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """添加元素，元素已存在时返回 False"""
+        added = False
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+
+class NonceStore:
+    """
+    防重放的唯一值存储，按时间戳所在的时间窗口分桶
+
+    优先使用 Redis `SET key NX EX` 原子地写入，键在时间窗口结束后过期；Redis 不可用时
+    退回到进程内的布隆过滤器，只保留当前和上一个时间窗口，内存由每个窗口的预计请求数决定。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filters = {}
+
+    @property
+    def window(self):
+        return int(settings.OAUTH['NONCE_WINDOW'].total_seconds())
+
+    def add(self, nonce, timestamp):
+        """
+        记录唯一值
+
+        Returns:
+            bool: 时间窗口内首次出现返回 True，重复出现返回 False
+        """
+        bucket = timestamp // self.window
+        try:
+            return self.add_redis(nonce, bucket)
+        except RedisError:
+            return self.add_local(nonce, bucket)
+
+    def add_redis(self, nonce, bucket):
+        key = CacheKeySet.NONCE.format(bucket=bucket, nonce=nonce)
+        return bool(get_redis_connection().set(key, 1, nx=True, ex=self.window * 2))
+
+    def add_local(self, nonce, bucket):
+        with self.lock:
+            bloom = self.filters.get(bucket)
+            if bloom is None:
+                bloom = self.filters[bucket] = BloomFilter(
+                    settings.OAUTH['NONCE_LOCAL_CAPACITY'],
+                    settings.OAUTH['NONCE_LOCAL_ERROR_RATE']
+                )
+                for expired in [b for b in self.filters if b < bucket - 1]:
+                    del self.filters[expired]
+            return bloom.add(nonce.encode())
+
+
+nonce_store = NonceStore()
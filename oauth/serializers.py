@@ -11,8 +11,10 @@ from rest_framework.settings import api_settings
 
 from commons import utils
 from commons.constants import Messages, CacheKeySet
-from commons.fields.serializers import DynamicFieldsMixin
+from commons.fields.serializers import DynamicFieldsMixin, ViewerRelationsMixin
+from commons.fields.serializers import ViewerRelationField, ViewerRelationsListSerializer
 from commons.fields.serializers import PhoneField, CaptchaField, PasswordField, TimesinceField
+from commons.fields.serializers import PendingViewsListSerializer, PendingViewsMixin
 from commons.fields.phonenumber import PhoneNumber
 from oauth import user_can_authenticate
 from oauth.email import CaptchaEmail
@@ -27,21 +29,22 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = ['name']
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(PendingViewsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Profile
         exclude = ['nick_mtime']
         read_only_fields = ['user', 'nickname']
+        list_serializer_class = PendingViewsListSerializer
 
 
-class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, ViewerRelationsMixin, serializers.ModelSerializer):
     date_joined = TimesinceField()
     avatar = serializers.ReadOnlyField()
     article_count = serializers.ReadOnlyField()
     post_count = serializers.ReadOnlyField()
-    is_following = serializers.ReadOnlyField()
-    is_followed = serializers.ReadOnlyField()
+    is_following = ViewerRelationField('following')
+    is_followed = ViewerRelationField('followed')
     following_count = serializers.ReadOnlyField()
     follower_count = serializers.ReadOnlyField()
     nickname = serializers.ReadOnlyField(source='profile.nickname')
@@ -55,6 +58,7 @@ class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
         ]
         fields = ['id', 'username', 'nickname', 'avatar', 'about_me', 'date_joined'] + expandable_fields
         read_only_fields = ['username']
+        list_serializer_class = ViewerRelationsListSerializer
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
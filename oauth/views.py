@@ -10,6 +10,7 @@ from rest_framework.response import Response
 from commons import selectors
 from commons.permissions import IsOwnerOrReadOnly
 from oauth import login_user, logout_user
+from oauth.caches import invalidate_user_snapshot
 from oauth.email import UserDestroyEmail
 from oauth.models import Profile
 from oauth.serializers import (
@@ -136,6 +137,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.is_active = False
         instance.save(update_fields=['is_active'])
+        invalidate_user_snapshot(instance.pk)
         destroy_user.apply_async((instance.pk,), eta=timezone.now() + settings.OAUTH['USER_DESTROY_LIFETIME'], expires=60)
 
     @action(['get'], detail=False)
@@ -207,6 +209,10 @@ class UserViewSet(viewsets.ModelViewSet):
         user.profile.viewed()
         return Response(ProfileSerializer(user.profile).data)
 
+    @action(methods=['get'], detail=False, permission_classes=[IsAuthenticated])
+    def timeline(self, request, *args, **kwargs):
+        return selectors.user_timeline(self, request.user, request)
+
     @action(methods=['get'], detail=True)
     def articles(self, request, *args, **kwargs):
         user = self.get_object()
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PoetryConfig(AppConfig):
     name = 'poetry'
     verbose_name = '诗歌'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from poetry.corpus import COLLECTIONS, delete_work, sync_work
+
+        for collection in COLLECTIONS:
+            post_save.connect(sync_work, sender=collection.model)
+            post_delete.connect(delete_work, sender=collection.model)
@@ -0,0 +1,143 @@
+from django.db import transaction
+
+from commons.utils import chunks
+from poetry import models
+
+
+class Collection:
+    """
+    诗集，描述如何从诗集模型中取出标题、作者、朝代、韵律、篇章、章节和正文
+
+    字段参数为模型字段名，`dynasty` 为空时使用 `default_dynasty`。
+
+    Args:
+        name (str): 诗集名称，同时是接口路径
+        model (Model): 诗集模型
+        title (str): 标题字段
+        author (str): 作者字段
+        dynasty (str): 朝代字段
+        rhythm (str): 韵律字段
+        chapter (str): 篇章字段
+        section (str): 章节字段
+        lines (str): 正文字段，`ArrayField` 或文本
+        default_author (str): 默认作者
+        default_dynasty (str): 默认朝代
+    """
+
+    def __init__(self, name, model, title='title', author='author', dynasty=None, rhythm=None, chapter=None,
+                 section=None, lines='paragraphs', default_author='', default_dynasty=''):
+        self.name = name
+        self.model = model
+        self.title = title
+        self.author = author
+        self.dynasty = dynasty
+        self.rhythm = rhythm
+        self.chapter = chapter
+        self.section = section
+        self.lines = lines
+        self.default_author = default_author
+        self.default_dynasty = default_dynasty
+
+    @property
+    def verbose_name(self):
+        return self.model._meta.verbose_name
+
+    def get_title(self, obj):
+        if self.title:
+            return getattr(obj, self.title, '')
+        # 没有标题时使用正文开头
+        lines = self.get_lines(obj)
+        return lines[0][:16] if lines else ''
+
+    def get_author(self, obj):
+        return (getattr(obj, self.author, '') if self.author else '') or self.default_author
+
+    def get_dynasty(self, obj):
+        return (getattr(obj, self.dynasty, '') if self.dynasty else '') or self.default_dynasty
+
+    def get_rhythm(self, obj):
+        return getattr(obj, self.rhythm, '') if self.rhythm else ''
+
+    def get_chapter(self, obj):
+        return getattr(obj, self.chapter, '') if self.chapter else ''
+
+    def get_section(self, obj):
+        return getattr(obj, self.section, '') if self.section else ''
+
+    def get_lines(self, obj):
+        lines = getattr(obj, self.lines, None) if self.lines else None
+        if not lines:
+            return []
+        return [lines] if isinstance(lines, str) else list(lines)
+
+
+COLLECTIONS = [
+    Collection('tangpoem', models.TangPoem, default_dynasty='唐'),
+    Collection('songpoem', models.SongPoem, default_dynasty='宋'),
+    Collection('songlyric', models.SongLyric, title='rhythm', rhythm='rhythm', default_dynasty='宋'),
+    Collection('caocao', models.CaoCao, default_dynasty='魏晋'),
+    Collection('chulyric', models.ChuLyric, section='section', lines='content', default_dynasty='先秦'),
+    Collection('lunyu', models.LunYu, author=None, default_author='孔子', default_dynasty='先秦'),
+    Collection('shijing', models.Shijing, author=None, chapter='chapter', section='section', lines='content',
+               default_dynasty='先秦'),
+    Collection('yuanqu', models.YuanQu, dynasty='dynasty', default_dynasty='元'),
+    Collection('huajianji', models.HuaJianji, rhythm='rhythm', default_dynasty='五代'),
+    Collection('nantang', models.NanTang, rhythm='rhythm', default_dynasty='五代'),
+    Collection('baijiaxing', models.BaiJiaXing, dynasty='dynasty'),
+    Collection('xingorigin', models.XingOrigin, dynasty='dynasty', lines='place'),
+    Collection('dizigui', models.DiZiGui, chapter='chapter', default_dynasty='清'),
+    Collection('guwenguanzhi', models.GuWenGuanZhi, chapter='chapter'),
+    Collection('qianjiashi', models.QianJiaShi),
+    Collection('qianziwen', models.QianZiWen, dynasty='dynasty'),
+    Collection('sanzijing', models.SanZiJing, default_dynasty='宋'),
+    Collection('shisanbai', models.ShiSanBai, chapter='chapter', default_dynasty='唐'),
+    Collection('zhuzijiaxun', models.ZhuZiJiaXun, default_dynasty='清'),
+    Collection('sishuwujing', models.SiShuWuJing, author=None, default_dynasty='先秦'),
+    Collection('youmengying', models.YouMengYing, title=None, author=None, lines='content',
+               default_author='张潮', default_dynasty='清'),
+]
+
+COLLECTIONS_BY_NAME = {collection.name: collection for collection in COLLECTIONS}
+
+COLLECTIONS_BY_MODEL = {collection.model: collection for collection in COLLECTIONS}
+
+
+def make_work(collection, obj):
+    lines = collection.get_lines(obj)
+    return models.Work(
+        collection=collection.name,
+        source_id=obj.pk,
+        title=collection.get_title(obj)[:64],
+        author=collection.get_author(obj)[:64],
+        dynasty=collection.get_dynasty(obj)[:64],
+        rhythm=collection.get_rhythm(obj)[:64],
+        chapter=collection.get_chapter(obj)[:64],
+        section=collection.get_section(obj)[:64],
+        lines=lines,
+        text='\n'.join(lines)
+    )
+
+
+def rebuild(collection, batch_size=2000):
+    """从诗集表重建一个诗集的作品"""
+    count = 0
+    queryset = collection.model._default_manager.order_by().iterator(chunk_size=batch_size)
+    with transaction.atomic():
+        models.Work.objects.filter(collection=collection.name).delete()
+        for batch in chunks(queryset, batch_size):
+            models.Work.objects.bulk_create([make_work(collection, obj) for obj in batch])
+            count += len(batch)
+    return count
+
+
+def sync_work(sender, instance, raw=False, **kwargs):
+    collection = COLLECTIONS_BY_MODEL[sender]
+    work = make_work(collection, instance)
+    fields = ('title', 'author', 'dynasty', 'rhythm', 'chapter', 'section', 'lines', 'text')
+    defaults = {field: getattr(work, field) for field in fields}
+    models.Work.objects.update_or_create(collection=collection.name, source_id=instance.pk, defaults=defaults)
+
+
+def delete_work(sender, instance, **kwargs):
+    collection = COLLECTIONS_BY_MODEL[sender]
+    models.Work.objects.filter(collection=collection.name, source_id=instance.pk).delete()
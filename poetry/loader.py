@@ -0,0 +1,220 @@
+import io
+import json
+import queue
+import re
+import threading
+import uuid
+
+from django.apps import apps
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, transaction
+
+from commons.utils import chunks
+
+# 内容哈希主键的命名空间，修改后重复导入会产生重复数据
+NAMESPACE = uuid.UUID('6f1c3d4e-2b0a-5c8e-9d7f-1a2b3c4d5e6f')
+
+WHITESPACE = re.compile(r'\s*')
+
+DELIMITERS = frozenset(',]}' + ' \t\n\r')
+
+
+def iter_json(fp, chunk_size=1 << 16):
+    """
+    逐个解析文件中的 JSON 值，顶层为数组时逐个返回数组元素
+
+    每次只读取 `chunk_size` 个字符，用 `raw_decode` 从缓冲区解析出完整的值，
+    内存占用只与单个元素的大小有关。
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    in_array = None
+
+    while True:
+        pos = WHITESPACE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                if in_array:
+                    raise ValueError('Unterminated JSON array')
+                return
+            chunk = fp.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+
+        char = buf[pos]
+        if in_array is None:
+            in_array = char == '['
+            pos += int(in_array)
+            continue
+        if in_array and char == ',':
+            pos += 1
+            continue
+        if in_array and char == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            end = None
+        # 数字等标量后面必须是分隔符才能确定解析完整，如 `1.5` 在 `.` 处截断时会先解析出 `1`
+        truncated = end is not None and not isinstance(value, (dict, list, str)) and (
+            end == len(buf) or buf[end] not in DELIMITERS
+        )
+        if end is None or (end == len(buf) and not eof) or (truncated and not eof):
+            if eof:
+                raise ValueError(f'Invalid JSON at {pos}')
+            chunk = fp.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+
+        pos = end
+        yield value
+
+
+class Source:
+    """
+    清单中的一项，将一组 JSON 文件映射到一个诗词模型
+
+    Args:
+        model (str): 模型名称
+        files (list): 相对数据目录的文件路径，支持通配符
+        fields (dict): 模型字段到 JSON 键的映射，默认同名
+        defaults (dict): JSON 中缺少的字段使用的默认值
+        items (str): 元素为对象且作品列表在该键下时，展开为多行，其余键作为每行的默认值
+        pk (str): 使用数据中该键的 UUID 作主键，用于与其他数据关联，默认按内容计算
+    """
+
+    def __init__(self, model, files, fields=None, defaults=None, items=None, pk=None):
+        self.model = apps.get_model('poetry', model)
+        self.files = files
+        self.fields = fields or {}
+        self.defaults = defaults or {}
+        self.items = items
+        self.pk = pk
+        self.columns = [f for f in self.model._meta.concrete_fields if not f.primary_key]
+
+    def __str__(self):
+        return f'{self.model.__name__}: {", ".join(self.files)}'
+
+    def get_paths(self, root):
+        for pattern in self.files:
+            yield from sorted(root.glob(pattern))
+
+    def expand(self, value):
+        if not self.items:
+            yield value
+            return
+        parent = {k: v for k, v in value.items() if k != self.items}
+        for item in value.get(self.items) or []:
+            yield {**parent, **item}
+
+    def make_value(self, field, value):
+        if value is None:
+            value = self.defaults.get(field.name)
+        if isinstance(field, ArrayField):
+            if value is None:
+                return []
+            values = [value] if isinstance(value, str) else list(value)
+            max_length = getattr(field.base_field, 'max_length', None)
+            return [str(v)[:max_length] for v in values]
+        if value is None:
+            return field.get_default()
+        return str(value)[:field.max_length] if field.max_length else value
+
+    def make_row(self, item):
+        """主键默认由模型和内容计算，重复导入相同内容时主键不变"""
+        values = [self.make_value(f, item.get(self.fields.get(f.name, f.name))) for f in self.columns]
+        if self.pk and item.get(self.pk):
+            return (str(uuid.UUID(item[self.pk])), *values)
+        content = json.dumps([self.model._meta.label, values], ensure_ascii=False, sort_keys=True)
+        return (str(uuid.uuid5(NAMESPACE, content)), *values)
+
+    def rows(self, root):
+        for path in self.get_paths(root):
+            with open(path, 'rt', encoding='utf-8') as f:
+                for value in iter_json(f):
+                    for item in self.expand(value):
+                        yield self.make_row(item)
+
+
+def read_manifest(path):
+    with open(path, 'rt', encoding='utf-8') as f:
+        return [Source(**entry) for entry in json.load(f)]
+
+
+def copy_text(value):
+    """COPY 文本格式的字段值"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, list):
+        items = ('NULL' if v is None else '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value)
+        value = '{' + ','.join(items) + '}'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(model, rows):
+    """
+    用 `COPY` 写入临时表，再插入目标表，主键冲突的行跳过
+
+    Returns:
+        int: 新插入的行数
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ', '.join(qn(f.column) for f in model._meta.concrete_fields)
+    # 同一批次内的重复内容只保留一行
+    rows = {row[0]: row for row in rows}.values()
+    data = io.StringIO(''.join('\t'.join(map(copy_text, row)) + '\n' for row in rows))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE poetry_load (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP')
+        cursor.copy_expert(f'COPY poetry_load ({columns}) FROM STDIN', data)
+        cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM poetry_load ON CONFLICT DO NOTHING')
+        return cursor.rowcount
+
+
+def load(source, root, workers=4, batch_size=5000):
+    """
+    流式读取一项清单并由多个线程并行写入
+
+    读取和写入之间的队列有长度上限，内存中最多保留 `workers * 3` 个批次。
+
+    Returns:
+        tuple: 读取行数和新插入行数
+    """
+    tasks = queue.Queue(maxsize=workers * 2)
+    inserted = []
+    errors = []
+
+    def work():
+        try:
+            while (batch := tasks.get()) is not None:
+                if errors:
+                    continue
+                try:
+                    inserted.append(copy_rows(source.model, batch))
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, name=f'poetry-loader-{i}', daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    read = 0
+    try:
+        for batch in chunks(source.rows(root), batch_size):
+            if errors:
+                break
+            tasks.put(batch)
+            read += len(batch)
+    finally:
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return read, sum(inserted)
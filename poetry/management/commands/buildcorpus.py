@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from poetry import pools
+from poetry.corpus import COLLECTIONS, COLLECTIONS_BY_NAME, rebuild
+
+
+class Command(BaseCommand):
+    help = '从各诗集表重建统一作品表'
+
+    def add_arguments(self, parser):
+        parser.add_argument('collections', nargs='*', help='诗集名称，默认全部')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            collections = [COLLECTIONS_BY_NAME[name] for name in options['collections']] or COLLECTIONS
+        except KeyError as e:
+            raise CommandError(f'Unknown collection {e}')
+
+        for collection in collections:
+            start = time.monotonic()
+            count = rebuild(collection, options['batch_size'])
+            pools.refresh(collection.name)
+            self.stdout.write(f'{collection.name}: {count} rows in {time.monotonic() - start:.1f}s')
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from poetry import prosody
+
+
+class Command(BaseCommand):
+    help = '从平仄数据重新统计字的平仄和韵部'
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        table = prosody.get_table(rebuild=True)
+        chars = sum(1 for tone in table.tones if tone)
+        groups = len(set(table.rhymes) - {0})
+        self.stdout.write(f'{chars} chars, {groups} rhyme groups in {time.monotonic() - start:.1f}s')
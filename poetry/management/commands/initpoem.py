@@ -1,53 +1,53 @@
-import json
-import itertools
-from django.core.management.base import BaseCommand
-from poetry.models import Author, YouMengYing
-
-
-def init_author():
-    files = [
-        'poetry/management/commands/author.tangpoem.json',
-        'poetry/management/commands/author.songpoem.json',
-        'poetry/management/commands/author.songlyric.json'
-    ]
-    authors = []
-    for file in files:
-        with open(file, 'rt', encoding='utf-8') as f:
-            data = json.load(f)
-            for row in data:
-                author = Author(**row)
-                authors.append(author)
-
-    batch_size = 1000
-    authors = iter(authors)
-    while True:
-        batch = list(itertools.islice(authors, batch_size))
-        if not batch:
-            break
-        Author.objects.bulk_create(batch, batch_size, ignore_conflicts=True)
-        print('ok')
-
-
-def init_youmengying():
-    file = "/Users/fuyun/Personal/chinese-poetry/youmengying/youmengying.json"
-    items = []
-    with open(file, 'rt', encoding='utf-8') as f:
-        data = json.load(f)
-        for row in data:
-            i = YouMengYing(**row)
-            items.append(i)
-    batch_size = 1000
-    items = iter(items)
-    while True:
-        batch = list(itertools.islice(items, batch_size))
-        if not batch:
-            break
-        YouMengYing.objects.bulk_create(batch, batch_size, ignore_conflicts=True)
-        print('ok')
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from poetry import loader, pools
+from poetry.corpus import COLLECTIONS_BY_MODEL, rebuild
+
+MANIFEST = Path(__file__).resolve().parent.parent.parent / 'manifest.json'
 
 
 class Command(BaseCommand):
+    help = '按清单导入 chinese-poetry 数据，重复导入时跳过相同内容'
+
+    def add_arguments(self, parser):
+        parser.add_argument('root', type=Path, help='数据目录')
+        parser.add_argument('models', nargs='*', help='模型名称，默认全部')
+        parser.add_argument('--manifest', type=Path, default=MANIFEST)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=5000)
 
     def handle(self, *args, **options):
-        # init_author()
-        init_youmengying()
+        root = options['root']
+        if not root.is_dir():
+            raise CommandError(f'{root} is not a directory')
+
+        try:
+            sources = loader.read_manifest(options['manifest'])
+        except (OSError, ValueError, LookupError, TypeError) as e:
+            raise CommandError(f'Invalid manifest: {e}')
+
+        names = {name.lower() for name in options['models']}
+        if names:
+            sources = [s for s in sources if s.model._meta.model_name in names]
+
+        loaded = set()
+        for source in sources:
+            start = time.monotonic()
+            read, inserted = loader.load(source, root, options['workers'], options['batch_size'])
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f'{source} read {read}, inserted {inserted} in {elapsed:.1f}s ({read / max(elapsed, 1e-6):.0f} rows/s)'
+            )
+            if inserted:
+                loaded.add(source.model)
+
+        # COPY 不触发信号，重建导入过的诗集的作品和抽样池
+        for model in loaded:
+            if model in COLLECTIONS_BY_MODEL:
+                collection = COLLECTIONS_BY_MODEL[model]
+                count = rebuild(collection)
+                pools.refresh(collection.name)
+                self.stdout.write(f'{collection.name}: {count} works')
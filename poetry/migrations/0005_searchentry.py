@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:29
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poetry', '0004_auto_20211009_1515'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(max_length=32, verbose_name='诗集')),
+                ('source_id', models.UUIDField(verbose_name='原文主键')),
+                ('title', models.CharField(blank=True, max_length=64, verbose_name='标题')),
+                ('author', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='作者')),
+                ('dynasty', models.CharField(blank=True, db_index=True, max_length=64, verbose_name='朝代')),
+                ('text', models.TextField(blank=True, verbose_name='正文')),
+            ],
+            options={
+                'verbose_name': '诗词检索',
+                'verbose_name_plural': '诗词检索',
+                'ordering': ['id'],
+                'get_latest_by': 'id',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='poetry_search_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['author'], name='poetry_search_author_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['text'], name='poetry_search_text_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchentry',
+            unique_together={('collection', 'source_id')},
+        ),
+    ]
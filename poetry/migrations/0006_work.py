@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:02
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poetry', '0005_searchentry'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='SearchEntry',
+            new_name='Work',
+        ),
+        migrations.AlterModelOptions(
+            name='work',
+            options={'get_latest_by': 'id', 'ordering': ['id'], 'verbose_name': '作品', 'verbose_name_plural': '作品'},
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='rhythm',
+            field=models.CharField(blank=True, max_length=64, verbose_name='韵律'),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='chapter',
+            field=models.CharField(blank=True, max_length=64, verbose_name='篇章'),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='section',
+            field=models.CharField(blank=True, max_length=64, verbose_name='章节'),
+        ),
+        migrations.AddField(
+            model_name='work',
+            name='lines',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, size=None),
+        ),
+    ]
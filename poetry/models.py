@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 
 
 class Author(models.Model):
@@ -379,3 +380,36 @@ class YouMengYing(models.Model):
         get_latest_by = 'id'
         verbose_name = '幽梦影'
         verbose_name_plural = verbose_name
+
+
+class Work(models.Model):
+    """
+    全部诗集的统一作品表，由各诗集表同步
+
+    `lines` 为正文诗句，`text` 为按行拼接的正文，标题、作者和正文上建立 pg_trgm GIN 索引。
+    """
+    collection = models.CharField('诗集', max_length=32)
+    source_id = models.UUIDField('原文主键')
+    title = models.CharField('标题', max_length=64, blank=True)
+    author = models.CharField('作者', max_length=64, blank=True, db_index=True)
+    dynasty = models.CharField('朝代', max_length=64, blank=True, db_index=True)
+    rhythm = models.CharField('韵律', max_length=64, blank=True)
+    chapter = models.CharField('篇章', max_length=64, blank=True)
+    section = models.CharField('章节', max_length=64, blank=True)
+    lines = ArrayField(models.TextField(), default=list, blank=True)
+    text = models.TextField('正文', blank=True)
+
+    class Meta:
+        ordering = ['id']
+        get_latest_by = 'id'
+        verbose_name = '作品'
+        verbose_name_plural = verbose_name
+        unique_together = [['collection', 'source_id']]
+        indexes = [
+            GinIndex(name='poetry_search_title_trgm', fields=['title'], opclasses=['gin_trgm_ops']),
+            GinIndex(name='poetry_search_author_trgm', fields=['author'], opclasses=['gin_trgm_ops']),
+            GinIndex(name='poetry_search_text_trgm', fields=['text'], opclasses=['gin_trgm_ops']),
+        ]
+
+    def __str__(self):
+        return self.title
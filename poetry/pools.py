@@ -0,0 +1,174 @@
+import hashlib
+import math
+import random
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.aggregates import Count
+from django.db.models.expressions import F, Window
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from commons.constants import CacheKeySet
+from commons.utils import chunks
+from poetry.models import Work
+
+MODES = ['uniform', 'weighted', 'daily']
+
+# 有序集合的分数为累计权重，均匀抽取按排名，加权抽取按分数
+PICK_SCRIPT = """
+local n = redis.call('zcard', KEYS[1])
+if n == 0 then
+    return false
+end
+if ARGV[1] == 'weighted' then
+    local last = redis.call('zrange', KEYS[1], -1, -1, 'withscores')
+    local score = tonumber(ARGV[2]) * tonumber(last[2])
+    return redis.call('zrangebyscore', KEYS[1], '(' .. score, '+inf', 'limit', 0, 1)[1]
+end
+local rank = math.floor(tonumber(ARGV[2]) * n)
+return redis.call('zrange', KEYS[1], rank, rank)[1]
+"""
+
+
+def get_key(collection):
+    return CacheKeySet.POETRY_POOL.format(collection=collection)
+
+
+def get_weight(author_works):
+    """作品越多的作者越知名，取对数避免少数作者占满"""
+    return 1 + math.log(author_works) if author_works else 1
+
+
+def refresh(collection):
+    """
+    从作品表重建一个诗集的抽样池，写入临时键后整体替换
+
+    重建时持有锁，其他进程同时重建时直接返回现有池的大小；临时键带随机后缀，互不干扰。
+    诗集没有作品时记下空标记，`ensure` 在标记过期前不再重建。
+
+    Returns:
+        int: 池中作品数
+    """
+    conn = get_redis_connection()
+    key = get_key(collection)
+    lock = conn.lock(f'{key}:lock', timeout=settings.POETRY['POOL_REFRESH_TIMEOUT'].total_seconds())
+    if not lock.acquire(blocking=False):
+        return conn.zcard(key)
+
+    try:
+        tmp = f'{key}:refreshing:{uuid.uuid4().hex}'
+        queryset = Work.objects.filter(collection=collection).annotate(
+            author_works=Window(Count('id'), partition_by=[F('author')])
+        ).order_by('id').values_list('source_id', 'author', 'author_works').iterator()
+
+        count = 0
+        total = 0
+        for batch in chunks(queryset, settings.POETRY['POOL_BATCH_SIZE']):
+            mapping = {}
+            for source_id, author, author_works in batch:
+                total += get_weight(author_works if author else 0)
+                mapping[str(source_id)] = total
+            conn.zadd(tmp, mapping)
+            count += len(batch)
+
+        empty_key = CacheKeySet.POETRY_POOL_EMPTY.format(collection=collection)
+        if count:
+            conn.rename(tmp, key)
+            cache.delete(empty_key)
+        else:
+            conn.delete(key)
+            cache.set(empty_key, True, settings.POETRY['POOL_EMPTY_TIMEOUT'].total_seconds())
+        return count
+    finally:
+        lock.release()
+
+
+def ensure(collection):
+    """抽样池为空时重建，最近确认过诗集没有作品时跳过"""
+    if cache.get(CacheKeySet.POETRY_POOL_EMPTY.format(collection=collection)):
+        return 0
+    return refresh(collection)
+
+
+def get_fraction(collection, date):
+    """同一天同一诗集得到相同的 [0, 1) 之间的数"""
+    digest = hashlib.sha1(f'{collection}:{date.isoformat()}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+
+def pick(collection, mode='uniform', date=None):
+    """
+    从抽样池中抽取一首作品的原文主键，池不存在时先重建
+
+    Args:
+        collection (str): 诗集名称
+        mode (str): `uniform` 均匀，`weighted` 按作者知名度加权，`daily` 按日期固定
+        date (date): `daily` 使用的日期，默认今天
+
+    Returns:
+        str: 原文主键，诗集没有作品时为 None
+    """
+    if mode == 'daily':
+        fraction = get_fraction(collection, date or timezone.localdate())
+        mode = 'weighted'
+    else:
+        fraction = random.random()
+
+    conn = get_redis_connection()
+    script = conn.register_script(PICK_SCRIPT)
+    member = script(keys=[get_key(collection)], args=[mode, fraction])
+    if member is None and ensure(collection):
+        member = script(keys=[get_key(collection)], args=[mode, fraction])
+    return member.decode() if member is not None else None
+
+
+def daily(collection, force=False):
+    """每日一首，当天内抽样池重建也不变，`force` 时重新抽取"""
+    date = timezone.localdate()
+    key = CacheKeySet.POETRY_DAILY.format(collection=collection, date=date.isoformat())
+    pk = None if force else cache.get(key)
+    if pk is None:
+        pk = pick(collection, 'daily', date)
+        if pk is not None:
+            cache.set(key, pk, settings.POETRY['DAILY_TIMEOUT'].total_seconds())
+    return pk
+
+
+def get_sizes(collections):
+    conn = get_redis_connection()
+    pipe = conn.pipeline(transaction=False)
+    for collection in collections:
+        pipe.zcard(get_key(collection))
+    return dict(zip(collections, pipe.execute()))
+
+
+def choose(collections, mode='uniform'):
+    """
+    从多个诗集中选出一个，诗集按作品数加权，`daily` 时当天固定
+
+    Returns:
+        str: 诗集名称，都没有作品时为 None
+    """
+    sizes = get_sizes(collections)
+    for collection, size in sizes.items():
+        if not size:
+            sizes[collection] = ensure(collection)
+    sizes = {collection: size for collection, size in sizes.items() if size}
+
+    total = sum(sizes.values())
+    if not total:
+        return None
+
+    if mode == 'daily':
+        fraction = get_fraction(','.join(sorted(collections)), timezone.localdate())
+    else:
+        fraction = random.random()
+
+    point = fraction * total
+    for collection, size in sizes.items():
+        point -= size
+        if point < 0:
+            break
+    return collection
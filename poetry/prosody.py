@@ -0,0 +1,316 @@
+import heapq
+import re
+import threading
+from array import array
+from collections import Counter
+
+from django.core.cache import cache
+
+from commons import hanzi
+from commons.constants import CacheKeySet
+from commons.utils import chunks
+from poetry.models import SongPoem, Strain, TangPoem, Work
+
+# 声调用两位掩码表示，多音字或未知的字两种都算
+PING, ZE, BOTH = 1, 2, 3
+TONES = {'平': PING, '仄': ZE, '中': BOTH}
+TONE_NAMES = {PING: '平', ZE: '仄', BOTH: '中'}
+
+# 查找表覆盖基本多文种平面，之外的字视为未知
+TABLE_SIZE = 0x10000
+
+SEPARATORS = re.compile('[{}\\s,.!?;:]+'.format(re.escape(hanzi.punctuation)))
+
+
+def split_lines(text):
+    """按标点拆分诗句"""
+    if isinstance(text, str):
+        text = [text]
+    return [line for paragraph in text for line in SEPARATORS.split(paragraph) if line]
+
+
+def pattern_lines(*names):
+    return [BASE_LINES[name] for name in names]
+
+
+# 五言律句的四种基本句式，一三不论
+BASE_LINES = {
+    'A': '中仄平平仄',
+    'B': '平平仄仄平',
+    'C': '中平平仄仄',
+    'D': '中仄仄平平',
+}
+
+# 平起、仄起，首句入韵与否
+QUATRAINS = {
+    '仄起首句不入韵': ('A', 'B', 'C', 'D'),
+    '仄起首句入韵': ('D', 'B', 'C', 'D'),
+    '平起首句不入韵': ('C', 'D', 'A', 'B'),
+    '平起首句入韵': ('B', 'D', 'A', 'B'),
+}
+
+
+def lengthen(line):
+    """五言句前加两字成七言句，所加两字与五言句第二字平仄相反"""
+    return ('中平' if line[1] == '仄' else '中仄') + line
+
+
+# 平起、仄起由首句第二字决定，五言句加长后第二字平仄相反
+LENGTHENED_FORMS = {'平起': '仄起', '仄起': '平起'}
+
+
+def build_meters():
+    meters = {}
+    for form, names in QUATRAINS.items():
+        quatrain = pattern_lines(*names)
+        # 律诗后四句与首句不入韵的绝句相同
+        tail = pattern_lines(*QUATRAINS[form[:2] + '首句不入韵'])
+        long_form = LENGTHENED_FORMS[form[:2]] + form[2:]
+        for size, lines in (('绝句', quatrain), ('律诗', quatrain + tail)):
+            meters[f'五言{size}·{form}'] = lines
+            meters[f'七言{size}·{long_form}'] = [lengthen(line) for line in lines]
+    return meters
+
+
+METERS = build_meters()
+
+
+class ToneTable:
+    """
+    字到声调和韵部的查找表
+
+    `tones` 每个字一个字节，`rhymes` 每个字一个韵部编号，0 表示未知，
+    下标为字的码位，查找只是一次数组索引。
+    """
+
+    def __init__(self, tones=None, rhymes=None):
+        self.tones = tones if tones is not None else bytes(TABLE_SIZE)
+        self.rhymes = rhymes if rhymes is not None else array('H', bytes(TABLE_SIZE * 2))
+        # 字到四进制数字的转换表，整句用 `str.translate` 一次转换
+        self.digits = {code: '0123'[tone or BOTH] for code, tone in enumerate(self.tones)}
+
+    def tone(self, char):
+        code = ord(char)
+        return self.tones[code] if code < TABLE_SIZE else 0
+
+    def rhyme(self, char):
+        code = ord(char)
+        return self.rhymes[code] if code < TABLE_SIZE else 0
+
+    def encode(self, lines):
+        """诗句拼接后每字两位的声调掩码，第一个字在最低位，未知的字两种都算"""
+        text = ''.join(lines)
+        try:
+            return int(text.translate(self.digits)[::-1] or '0', 4)
+        except ValueError:
+            # 基本多文种平面之外的字
+            return int(''.join('0123'[self.tone(char) or BOTH] for char in reversed(text)) or '0', 4)
+
+    def describe(self, lines):
+        return [''.join(TONE_NAMES.get(self.tone(char), '中') for char in line) for line in lines]
+
+    def dumps(self):
+        return bytes(self.tones) + self.rhymes.tobytes()
+
+    @classmethod
+    def loads(cls, data):
+        rhymes = array('H')
+        rhymes.frombytes(data[TABLE_SIZE:])
+        return cls(data[:TABLE_SIZE], rhymes)
+
+
+class Pattern:
+    """一组诗句的平仄格律，可以与诗句的声调掩码批量比较"""
+
+    def __init__(self, lines, name=''):
+        self.name = name
+        self.lines = lines
+        self.lengths = [len(line) for line in lines]
+        self.size = sum(self.lengths)
+        self.mask = 0
+        for shift, char in enumerate(''.join(lines)):
+            self.mask |= TONES.get(char, BOTH) << (shift * 2)
+        # 每两位的低位
+        self.low = int('01' * self.size, 2)
+
+    @classmethod
+    def parse(cls, text):
+        return cls(split_lines(text))
+
+    def matches(self, lines):
+        return [len(line) for line in lines] == self.lengths
+
+    def score(self, mask):
+        """两位中有一位相同即为合律，返回合律字数占比"""
+        hits = mask & self.mask
+        return bin((hits | hits >> 1) & self.low).count('1') / self.size
+
+
+def find_rhymes(lines):
+    """韵脚，即偶数句的句尾字"""
+    return [line[-1] for i, line in enumerate(lines) if i % 2 == 1]
+
+
+def learn_tones(batch_size=2000):
+    """
+    对齐平仄数据与原诗统计每个字的平仄
+
+    `Strain` 与原诗主键相同，多数情况读平声的字为平，读仄声的为仄，两者都常见的为多音字。
+    """
+    ping = Counter()
+    ze = Counter()
+    queryset = Strain.objects.order_by().values_list('id', 'strains').iterator(chunk_size=batch_size)
+    for batch in chunks(queryset, batch_size):
+        strains = dict(batch)
+        poems = {}
+        for model in (TangPoem, SongPoem):
+            poems.update(model.objects.filter(pk__in=strains).values_list('id', 'paragraphs'))
+        for pk, paragraphs in poems.items():
+            text_lines = split_lines(paragraphs)
+            tone_lines = split_lines(strains[pk])
+            if len(text_lines) != len(tone_lines):
+                continue
+            for text, tones in zip(text_lines, tone_lines):
+                if len(text) != len(tones):
+                    continue
+                for char, tone in zip(text, tones):
+                    if tone == '平':
+                        ping[char] += 1
+                    elif tone == '仄':
+                        ze[char] += 1
+
+    tones = bytearray(TABLE_SIZE)
+    for char in ping.keys() | ze.keys():
+        code = ord(char)
+        if code >= TABLE_SIZE:
+            continue
+        ratio = ping[char] / (ping[char] + ze[char])
+        tones[code] = PING if ratio >= 0.8 else ZE if ratio <= 0.2 else BOTH
+    return bytes(tones)
+
+
+def learn_rhymes(tones, min_count=2, batch_size=2000):
+    """
+    从近体诗的韵脚归纳韵部
+
+    同一首诗的平声韵脚属于同一韵部，共同押韵达到 `min_count` 次的字合并，
+    结果接近平水韵，通押和多音字会使少数韵部合并。
+    """
+    table = ToneTable(tones)
+    pairs = Counter()
+    queryset = Work.objects.filter(collection__in=['tangpoem', 'songpoem'], lines__len__in=[2, 4]) \
+        .order_by().values_list('lines', flat=True).iterator(chunk_size=batch_size)
+    for paragraphs in queryset:
+        lines = split_lines(paragraphs)
+        if len(lines) not in (4, 8) or len({len(line) for line in lines}) != 1 or len(lines[0]) not in (5, 7):
+            continue
+        chars = sorted({char for char in find_rhymes(lines) if table.tone(char) == PING})
+        for i, a in enumerate(chars):
+            for b in chars[i + 1:]:
+                pairs[a, b] += 1
+
+    parent = list(range(TABLE_SIZE))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for (a, b), count in pairs.items():
+        a, b = ord(a), ord(b)
+        if count >= min_count and a < TABLE_SIZE and b < TABLE_SIZE:
+            parent[find(a)] = find(b)
+
+    rhymes = array('H', bytes(TABLE_SIZE * 2))
+    groups = {}
+    for a, b in pairs:
+        for code in (ord(a), ord(b)):
+            if code >= TABLE_SIZE:
+                continue
+            rhymes[code] = groups.setdefault(find(code), len(groups) + 1)
+    return rhymes
+
+
+def build_table():
+    tones = learn_tones()
+    return ToneTable(tones, learn_rhymes(tones))
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def get_table(rebuild=False):
+    """进程内只加载一次，缓存中没有时从数据库统计"""
+    global _table
+
+    if _table is not None and not rebuild:
+        return _table
+
+    with _lock:
+        if _table is None or rebuild:
+            data = None if rebuild else cache.get(CacheKeySet.PROSODY)
+            if data is None:
+                table = build_table()
+                cache.set(CacheKeySet.PROSODY, table.dumps(), None)
+            else:
+                table = ToneTable.loads(data)
+            _table = table
+    return _table
+
+
+def classify(text):
+    """
+    判断诗句的格律
+
+    Returns:
+        dict: 最接近的格律、合律字数占比、每句平仄和是否押韵
+    """
+    table = get_table()
+    lines = split_lines(text)
+    mask = table.encode(lines)
+    best, score = None, 0
+    for name, pattern_text in METERS.items():
+        pattern = Pattern(pattern_text, name)
+        if pattern.matches(lines) and pattern.score(mask) > score:
+            best, score = pattern, pattern.score(mask)
+
+    rhymes = [table.rhyme(char) for char in find_rhymes(lines)]
+    return {
+        'meter': best.name if best else None,
+        'score': round(score, 4),
+        'tones': table.describe(lines),
+        'rhyme': bool(rhymes) and 0 not in rhymes and len(set(rhymes)) == 1,
+    }
+
+
+def search(pattern, collections=('tangpoem', 'songpoem'), min_score=0.9, limit=20, batch_size=2000):
+    """
+    在作品中查找符合格律的诗
+
+    先按段落数量过滤，再逐首计算声调掩码与格律比较，返回得分最高的 `limit` 首。
+
+    Args:
+        pattern (Pattern): 格律
+        collections (list): 诗集
+        min_score (float): 最低合律字数占比
+        limit (int): 返回数量
+
+    Returns:
+        list: `(score, work_id)`，得分从高到低
+    """
+    table = get_table()
+    # 每段至少一句
+    queryset = Work.objects.filter(collection__in=collections, lines__len__lte=len(pattern.lengths)).order_by() \
+        .values_list('id', 'lines').iterator(chunk_size=batch_size)
+
+    def scores():
+        for pk, paragraphs in queryset:
+            lines = split_lines(paragraphs)
+            if pattern.matches(lines):
+                score = pattern.score(table.encode(lines))
+                if score >= min_score:
+                    yield score, -pk
+
+    return [(score, -pk) for score, pk in heapq.nlargest(limit, scores())]
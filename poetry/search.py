@@ -0,0 +1,67 @@
+from django.db.models.expressions import Case, Value, When
+from django.db.models.functions import Length
+from django.db.models.query_utils import Q
+from django.utils.html import escape
+
+from poetry.models import Work
+
+# 关键词出现在不同字段时的得分
+WEIGHTS = {
+    'title': 4,
+    'author': 2,
+    'text': 1,
+}
+
+
+def search(query='', collections=None, dynasties=None, authors=None):
+    """
+    检索诗词，多个关键词以空格分隔，需全部命中
+
+    `LIKE '%关键词%'` 由 pg_trgm GIN 索引加速，按关键词命中的字段计算得分，
+    得分相同时正文越短越靠前。
+
+    Args:
+        query (str): 关键词
+        collections (list): 限定诗集
+        dynasties (list): 限定朝代
+        authors (list): 限定作者
+    """
+    queryset = Work.objects.defer('text')
+    if collections:
+        queryset = queryset.filter(collection__in=collections)
+    if dynasties:
+        queryset = queryset.filter(dynasty__in=dynasties)
+    if authors:
+        queryset = queryset.filter(author__in=authors)
+
+    terms = query.split()
+    if not terms:
+        return queryset
+
+    rank = Value(0)
+    for term in terms:
+        queryset = queryset.filter(Q(title__contains=term) | Q(author__contains=term) | Q(text__contains=term))
+        for field, weight in WEIGHTS.items():
+            rank += Case(When(**{f'{field}__contains': term}, then=Value(weight)), default=Value(0))
+
+    return queryset.annotate(rank=rank, length=Length('text')).order_by('-rank', 'length', 'id')
+
+
+def highlight(lines, query, max_lines=3):
+    """命中关键词的诗句，关键词用 `<em>` 标出"""
+    terms = query.split()
+    if not terms:
+        return []
+
+    results = []
+    for line in lines:
+        if not any(term in line for term in terms):
+            continue
+        line = escape(line)
+        for term in terms:
+            term = escape(term)
+            line = line.replace(term, f'<em>{term}</em>')
+        results.append(line)
+        if len(results) == max_lines:
+            break
+    return results
@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from poetry.models import Author, TangPoem, SongPoem, SongLyric, CaoCao, ChuLyric, \
     LunYu, Shijing, YuanQu, HuaJianji, NanTang, Strain, BaiJiaXing, XingOrigin, DiZiGui, \
-    GuWenGuanZhi, QianJiaShi, QianZiWen, SanZiJing, ShiSanBai, ZhuZiJiaXun, SiShuWuJing, YouMengYing
+    GuWenGuanZhi, QianJiaShi, QianZiWen, SanZiJing, ShiSanBai, ZhuZiJiaXun, SiShuWuJing, YouMengYing, \
+    Work
+from poetry.search import highlight
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -140,3 +142,16 @@ class YouMengYingSerializer(serializers.ModelSerializer):
     class Meta:
         model = YouMengYing
         fields = '__all__'
+
+
+class WorkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Work
+        exclude = ['text']
+
+
+class SearchResultSerializer(WorkSerializer):
+    highlight = serializers.SerializerMethodField()
+
+    def get_highlight(self, obj):
+        return highlight(obj.lines, self.context['query'])
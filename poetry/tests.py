@@ -0,0 +1,40 @@
+import io
+import json
+import random
+
+from django.test import SimpleTestCase
+
+from poetry.loader import iter_json
+
+
+class IterJsonTests(SimpleTestCase):
+
+    def test_number_across_chunks(self):
+        self.assertEqual(list(iter_json(io.StringIO('[1.5]'), chunk_size=1)), [1.5])
+        self.assertEqual(list(iter_json(io.StringIO('[12.25, 3]'), chunk_size=2)), [12.25, 3])
+        self.assertEqual(list(iter_json(io.StringIO('1e5 -2.5E-3'), chunk_size=1)), [1e5, -2.5e-3])
+
+    def test_fuzz(self):
+        rng = random.Random(0)
+
+        def make_value(depth=0):
+            kind = rng.randrange(7 if depth < 3 else 5)
+            if kind == 0:
+                return rng.randint(-10 ** 6, 10 ** 6)
+            if kind == 1:
+                return rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-20, 20)
+            if kind == 2:
+                return ''.join(rng.choice('ab"\\,]} 诗\n') for _ in range(rng.randrange(6)))
+            if kind == 3:
+                return rng.choice([True, False, None])
+            if kind == 4:
+                return rng.randint(0, 9)
+            if kind == 5:
+                return [make_value(depth + 1) for _ in range(rng.randrange(4))]
+            return {str(i): make_value(depth + 1) for i in range(rng.randrange(4))}
+
+        for _ in range(300):
+            values = [make_value() for _ in range(rng.randrange(6))]
+            text = json.dumps(values, ensure_ascii=False, indent=rng.choice([None, 1]))
+            for chunk_size in (1, 2, 3, 7):
+                self.assertEqual(list(iter_json(io.StringIO(text), chunk_size=chunk_size)), values)
@@ -1,13 +1,87 @@
-from rest_framework import mixins, viewsets
+from django.utils import timezone
+from rest_framework import generics, mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from commons import sampling
+from commons.constants import Messages
+from poetry import pools, prosody
+from poetry.corpus import COLLECTIONS, COLLECTIONS_BY_MODEL
 from poetry.models import Author, TangPoem, SongPoem, SongLyric, CaoCao, ChuLyric, LunYu, Shijing, YuanQu, HuaJianji, \
     NanTang, Strain, BaiJiaXing, XingOrigin, DiZiGui, GuWenGuanZhi, QianJiaShi, QianZiWen, SanZiJing, ShiSanBai, \
-    ZhuZiJiaXun, SiShuWuJing, YouMengYing
+    ZhuZiJiaXun, SiShuWuJing, YouMengYing, Work
 from poetry.serializers import AuthorSerializer, TangPoemSerializer, SongPoemSerializer, SongLyricSerializer, \
     CaoCaoSerializer, ChuLyricSerializer, LunYuSerializer, ShijingSerializer, YuanQuSerializer, HuaJianjiSerializer, \
     NanTangSerializer, StrainSerializer, BaiJiaXingSerializer, XingOriginSerializer, DiZiGuiSerializer, \
     GuWenGuanZhiSerializer, QianJiaShiSerializer, QianZiWenSerializer, SanZiJingSerializer, ShiSanBaiSerializer, \
-    ZhuZiJiaXunSerializer, SiShuWuJingSerializer, YouMengYingSerializer
+    ZhuZiJiaXunSerializer, SiShuWuJingSerializer, YouMengYingSerializer, WorkSerializer, \
+    SearchResultSerializer
+from poetry.search import search
+
+
+def get_param_list(request, name):
+    """查询参数，多个以逗号分隔"""
+    value = request.query_params.get(name)
+    return [item for item in value.split(',') if item] if value else None
+
+
+def get_mode(request):
+    mode = request.query_params.get('mode', 'uniform')
+    if mode not in pools.MODES:
+        raise ValidationError({'mode': Messages.UNKNOWN_MODE.format(mode)})
+    return mode
+
+
+def fetch_random(queryset, collection, mode, field='pk'):
+    """
+    从抽样池取出主键后只查询一次，抽到已删除的作品时重建抽样池再抽一次
+
+    `queryset` 必须是诗集的全部作品，与抽样池一致，否则抽中的作品不在其中会被误判为已删除。
+    """
+    for retry in (False, True):
+        if retry:
+            pools.refresh(collection)
+        pk = pools.daily(collection, force=retry) if mode == 'daily' else pools.pick(collection, mode)
+        if pk is None:
+            break
+        instance = queryset.filter(**{field: pk}).first()
+        if instance is not None:
+            return instance
+    raise NotFound
+
+
+def sample_filtered(queryset, mode, seed):
+    """
+    带筛选条件时不使用抽样池，从筛选后的主键中均匀抽取
+
+    `daily` 按 `seed` 和日期固定，`weighted` 不支持。
+    """
+    if mode == 'weighted':
+        raise ValidationError({'mode': Messages.MODE_NOT_FILTERABLE.format(mode)})
+    if mode == 'daily':
+        ids = sorted(sampling.get_ids(queryset))
+        if not ids:
+            raise NotFound
+        pk = ids[int(pools.get_fraction(seed, timezone.localdate()) * len(ids))]
+        return queryset.get(pk=pk)
+    instance = sampling.sample_ids(queryset, 1).first()
+    if instance is None:
+        raise NotFound
+    return instance
+
+
+class RandomMixin:
+    """随机一首，参数 mode 为 uniform 均匀、weighted 按作者知名度加权或 daily 每日一首"""
+
+    @action(['get'], detail=False)
+    def random(self, request):
+        # 抽样池包含诗集的全部作品，不使用列表的筛选条件
+        queryset = self.get_queryset()
+        collection = COLLECTIONS_BY_MODEL[queryset.model].name
+        instance = fetch_random(queryset, collection, get_mode(request))
+        return Response(self.get_serializer(instance).data)
 
 
 class AuthorViewSet(
@@ -29,6 +103,7 @@ class AuthorViewSet(
 
 
 class TangPoemViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -39,6 +114,7 @@ class TangPoemViewSet(
 
 
 class SongPoemViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -49,6 +125,7 @@ class SongPoemViewSet(
 
 
 class SongLyricViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -59,6 +136,7 @@ class SongLyricViewSet(
 
 
 class CaoCaoViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -69,6 +147,7 @@ class CaoCaoViewSet(
 
 
 class ChuLyricViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -79,6 +158,7 @@ class ChuLyricViewSet(
 
 
 class LunYuViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -89,6 +169,7 @@ class LunYuViewSet(
 
 
 class ShijingViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -99,6 +180,7 @@ class ShijingViewSet(
 
 
 class YuanQuViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -109,6 +191,7 @@ class YuanQuViewSet(
 
 
 class HuaJianjiViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -119,6 +202,7 @@ class HuaJianjiViewSet(
 
 
 class NanTangViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -137,8 +221,49 @@ class StrainViewSet(
     serializer_class = StrainSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(['get'], detail=False)
+    def classify(self, request):
+        """判断诗句的格律，参数 text 为诗句"""
+        text = request.query_params.get('text', '')
+        if not prosody.split_lines(text):
+            raise ValidationError({'text': Messages.VERSE_REQUIRED})
+        return Response(prosody.classify(text))
+
+    @action(['get'], detail=False)
+    def match(self, request):
+        """
+        查找符合格律的诗
+
+        参数 meter 为格律名称，或 pattern 为平仄如 `中仄平平仄，平平仄仄平。`；
+        collection 可选，多个以逗号分隔，默认唐诗和宋诗；score 为最低合律字数占比，默认 0.9
+        """
+        meter = request.query_params.get('meter')
+        if meter:
+            if meter not in prosody.METERS:
+                raise ValidationError({'meter': Messages.UNKNOWN_METER.format(meter)})
+            pattern = prosody.Pattern(prosody.METERS[meter], meter)
+        else:
+            pattern = prosody.Pattern.parse(request.query_params.get('pattern', ''))
+            if not pattern.size:
+                raise ValidationError({'pattern': Messages.VERSE_REQUIRED})
+
+        try:
+            min_score = float(request.query_params.get('score', 0.9))
+        except ValueError:
+            min_score = 0.9
+
+        results = prosody.search(
+            pattern,
+            collections=get_param_list(request, 'collection') or ['tangpoem', 'songpoem'],
+            min_score=min_score
+        )
+        works = Work.objects.defer('text').in_bulk([pk for _, pk in results])
+        data = [{'score': round(score, 4), **WorkSerializer(works[pk]).data} for score, pk in results]
+        return Response(data)
+
 
 class BaiJiaXingViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -149,6 +274,7 @@ class BaiJiaXingViewSet(
 
 
 class XingOriginViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -159,6 +285,7 @@ class XingOriginViewSet(
 
 
 class DiZiGuiViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -169,6 +296,7 @@ class DiZiGuiViewSet(
 
 
 class GuWenGuanZhiViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -179,6 +307,7 @@ class GuWenGuanZhiViewSet(
 
 
 class QianJiaShiViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -189,6 +318,7 @@ class QianJiaShiViewSet(
 
 
 class QianZiWenViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -199,6 +329,7 @@ class QianZiWenViewSet(
 
 
 class SanZiJingViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -209,6 +340,7 @@ class SanZiJingViewSet(
 
 
 class ShiSanBaiViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -219,6 +351,7 @@ class ShiSanBaiViewSet(
 
 
 class ZhuZiJiaXunViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -229,6 +362,7 @@ class ZhuZiJiaXunViewSet(
 
 
 class SiShuWuJingViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -239,6 +373,7 @@ class SiShuWuJingViewSet(
 
 
 class YouMengYingViewSet(
+    RandomMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
@@ -246,3 +381,74 @@ class YouMengYingViewSet(
     queryset = YouMengYing.objects.all()
     serializer_class = YouMengYingSerializer
     permission_classes = [IsAuthenticated]
+
+
+class WorkViewSet(
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet
+):
+    """
+    全部诗集的作品
+
+    collection、author、dynasty、rhythm、chapter 可选，多个以逗号分隔
+    """
+    queryset = Work.objects.defer('text')
+    serializer_class = WorkSerializer
+    permission_classes = [IsAuthenticated]
+    filter_fields = ['collection', 'author', 'dynasty', 'rhythm', 'chapter']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for field in self.filter_fields:
+            values = get_param_list(self.request, field)
+            if values:
+                queryset = queryset.filter(**{f'{field}__in': values})
+
+        return queryset
+
+    @action(['get'], detail=False)
+    def random(self, request):
+        """
+        从多个诗集中随机一首，诗集按作品数加权
+
+        参数 collection 可选，多个以逗号分隔，默认全部；mode 同各诗集的随机接口。
+        带 author、dynasty、rhythm、chapter 筛选时从筛选结果中均匀抽取，不支持 weighted。
+        """
+        mode = get_mode(request)
+        filters = {field: get_param_list(request, field) for field in self.filter_fields if field != 'collection'}
+        if any(filters.values()):
+            seed = '&'.join(f'{field}={",".join(sorted(values))}' for field, values in filters.items() if values)
+            seed = f'{",".join(sorted(get_param_list(request, "collection") or []))}?{seed}'
+            return Response(self.get_serializer(sample_filtered(self.get_queryset(), mode, seed)).data)
+
+        collections = get_param_list(request, 'collection') or [collection.name for collection in COLLECTIONS]
+        collection = pools.choose(collections, mode)
+        if collection is None:
+            raise NotFound
+        queryset = super().get_queryset().filter(collection=collection)
+        instance = fetch_random(queryset, collection, mode, 'source_id')
+        return Response(self.get_serializer(instance).data)
+
+
+class SearchView(generics.ListAPIView):
+    """
+    检索全部诗集
+
+    参数 q 关键词，多个以空格分隔；collection、dynasty、author 可选，多个以逗号分隔
+    """
+    serializer_class = SearchResultSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return search(
+            self.request.query_params.get('q', ''),
+            collections=get_param_list(self.request, 'collection'),
+            dynasties=get_param_list(self.request, 'dynasty'),
+            authors=get_param_list(self.request, 'author')
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['query'] = self.request.query_params.get('q', '')
+        return context
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='使用次数')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='内容类型')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='taggit.tag', verbose_name='标签')),
+            ],
+            options={
+                'verbose_name': '标签统计',
+                'verbose_name_plural': '标签统计',
+                'ordering': ['-count', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TagPair',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='共现次数')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag', verbose_name='相关标签')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairs', to='taggit.tag', verbose_name='标签')),
+            ],
+            options={
+                'verbose_name': '相关标签',
+                'verbose_name_plural': '相关标签',
+                'ordering': ['tag', '-count', 'related'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tagstat',
+            index=models.Index(fields=['content_type', '-count'], name='taggit_tags_content_0c2ba8_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagstat',
+            unique_together={('tag', 'content_type')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagpair',
+            unique_together={('tag', 'related')},
+        ),
+    ]
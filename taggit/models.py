@@ -1,13 +1,48 @@
-from django.db import models
+from collections import Counter
+
+from django.db import connections, models, transaction
+from django.db.models.query_utils import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 
+class TagManager(models.Manager):
+
+    def get_or_create_many(self, names):
+        """
+        按名称批量获取标签，不存在的批量创建，最多三次查询
+
+        `bulk_create` 不调用 `save`，需要手动生成 `slug`；`slug` 与已有标签相同的名称
+        对应到已有标签。
+
+        Returns:
+            dict: 名称 -> 标签
+        """
+        slugs = {name: slugify(name, allow_unicode=True) for name in names}
+        lookup = Q(name__in=slugs) | Q(slug__in=slugs.values())
+
+        def resolve(tags):
+            by_name = {tag.name: tag for tag in tags}
+            by_slug = {tag.slug: tag for tag in tags}
+            return {name: by_name.get(name) or by_slug.get(slug) for name, slug in slugs.items()}
+
+        tags = resolve(self.filter(lookup))
+        missing = [name for name, tag in tags.items() if tag is None]
+        if missing:
+            self.bulk_create([self.model(name=name, slug=slugs[name]) for name in missing], ignore_conflicts=True)
+            tags = resolve(self.filter(lookup))
+        return tags
+
+
 class Tag(models.Model):
     name = models.CharField('名称', unique=True, max_length=32)
     slug = models.SlugField(unique=True, max_length=255, editable=False)
 
+    objects = TagManager()
+
     class Meta:
         ordering = ['id']
         get_latest_by = 'id'
@@ -22,6 +57,40 @@ class Tag(models.Model):
         super().save(*args, **kwargs)
 
 
+class TaggedItemManager(models.Manager):
+
+    def bulk_tag(self, content_type, object_ids, tags):
+        """
+        给多个对象打上多个标签，已有的标签项跳过，查询次数与数量无关
+
+        `INSERT ... ON CONFLICT DO NOTHING RETURNING` 只返回实际插入的行，
+        并发插入了相同标签项时不会重复计数。
+
+        Returns:
+            list: 标签项，按对象和标签的顺序
+        """
+        rows = [(tag.pk, content_type.pk, object_id) for object_id in object_ids for tag in tags]
+        if rows:
+            connection = connections[self.db]
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+            now = timezone.now()
+            with transaction.atomic(using=self.db), connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (tag_id, content_type_id, object_id, created) VALUES {values} '
+                    f'ON CONFLICT (content_type_id, object_id, tag_id) DO NOTHING RETURNING tag_id',
+                    [value for row in rows for value in (*row, now)]
+                )
+                # 不触发信号，计数在这里更新
+                TagStat.objects.incr(Counter((tag_id, content_type.pk) for tag_id, in cursor.fetchall()))
+
+        items = self.filter(content_type=content_type, object_id__in=object_ids, tag__in=tags) \
+            .select_related('tag', 'content_type').prefetch_related('content_object')
+        object_order = {object_id: i for i, object_id in enumerate(object_ids)}
+        tag_order = {tag.pk: i for i, tag in enumerate(tags)}
+        return sorted(items, key=lambda item: (object_order[item.object_id], tag_order[item.tag_id]))
+
+
 class TaggedItem(models.Model):
     tag = models.ForeignKey(
         Tag,
@@ -34,6 +103,8 @@ class TaggedItem(models.Model):
     content_object = GenericForeignKey(ct_field='content_type', fk_field='object_id')
     created = models.DateTimeField('创建时间', auto_now_add=True, editable=False)
 
+    objects = TaggedItemManager()
+
     class Meta:
         ordering = ['id']
         get_latest_by = 'id'
@@ -50,3 +121,85 @@ class TaggedItem(models.Model):
             return self.content_object.is_owned(user)
         except AttributeError:
             return False
+
+
+class TagStatManager(models.Manager):
+
+    def incr(self, deltas):
+        """
+        批量增减标签使用次数，增加和减少各一条语句
+
+        Args:
+            deltas (dict): (标签主键, 内容类型主键) -> 增量
+        """
+        increments = [(*key, delta) for key, delta in deltas.items() if delta > 0]
+        decrements = [(*key, delta) for key, delta in deltas.items() if delta < 0]
+        if not (increments or decrements):
+            return
+
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            if increments:
+                values = ', '.join(['(%s, %s, %s)'] * len(increments))
+                cursor.execute(
+                    f'INSERT INTO {table} (tag_id, content_type_id, count) VALUES {values} '
+                    f'ON CONFLICT (tag_id, content_type_id) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+                    [value for row in increments for value in row]
+                )
+            if decrements:
+                values = ', '.join(['(%s, %s, %s)'] * len(decrements))
+                cursor.execute(
+                    f'UPDATE {table} SET count = GREATEST({table}.count + v.delta, 0) '
+                    f'FROM (VALUES {values}) AS v (tag_id, ct_id, delta) '
+                    f'WHERE {table}.tag_id = v.tag_id AND {table}.content_type_id = v.ct_id',
+                    [value for row in decrements for value in row]
+                )
+
+
+class TagStat(models.Model):
+    """标签在每种内容类型上的使用次数，随标签项增删更新，定时任务重新统计"""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='stats', verbose_name='标签')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name='内容类型')
+    count = models.PositiveIntegerField('使用次数', default=0)
+
+    objects = TagStatManager()
+
+    class Meta:
+        ordering = ['-count', 'id']
+        verbose_name = '标签统计'
+        verbose_name_plural = verbose_name
+        unique_together = [['tag', 'content_type']]
+        indexes = [models.Index(fields=['content_type', '-count'])]
+
+    def __str__(self):
+        return f'{self.tag}: {self.count}'
+
+
+class TagPair(models.Model):
+    """同一对象上共同出现的标签，每个标签只保留共现次数最多的前几个，由定时任务重建"""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='pairs', verbose_name='标签')
+    related = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+', verbose_name='相关标签')
+    count = models.PositiveIntegerField('共现次数', default=0)
+
+    class Meta:
+        ordering = ['tag', '-count', 'related']
+        verbose_name = '相关标签'
+        verbose_name_plural = verbose_name
+        unique_together = [['tag', 'related']]
+
+    def __str__(self):
+        return f'{self.tag} -> {self.related}: {self.count}'
+
+
+def item_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        TagStat.objects.incr({(instance.tag_id, instance.content_type_id): 1})
+
+
+def item_deleted(sender, instance, **kwargs):
+    TagStat.objects.incr({(instance.tag_id, instance.content_type_id): -1})
+
+
+post_save.connect(item_created, sender=TaggedItem)
+post_delete.connect(item_deleted, sender=TaggedItem)
@@ -1,5 +1,3 @@
-from operator import itemgetter
-
 from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -7,7 +5,7 @@ from rest_framework.exceptions import ValidationError
 from commons.constants import Messages
 from commons.fields.serializers import ContentTypeNaturalKeyField, GenericRelatedField, CheckContentTypeMixin
 from commons.utils import word_tokenize
-from taggit.models import Tag, TaggedItem
+from taggit.models import Tag, TaggedItem, TagPair
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -16,6 +14,18 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class PopularTagSerializer(TagSerializer):
+    count = serializers.IntegerField(source='usage', label='使用次数', read_only=True)
+
+
+class TagPairSerializer(serializers.ModelSerializer):
+    related = TagSerializer(read_only=True)
+
+    class Meta:
+        model = TagPair
+        fields = ['related', 'count']
+
+
 class TaggedItemSerializer(CheckContentTypeMixin, serializers.ModelSerializer):
     content_type = ContentTypeNaturalKeyField(label='内容类型')
     content_object = GenericRelatedField(action_models='TAGGIT_MODELS', read_only=True)
@@ -44,36 +54,50 @@ class TaggedItemSerializer(CheckContentTypeMixin, serializers.ModelSerializer):
         return tagged_item
 
 
-class BulkTaggedSerializer(CheckContentTypeMixin, serializers.ModelSerializer):
+class BulkTaggedSerializer(serializers.ModelSerializer):
     content_type = ContentTypeNaturalKeyField(label='内容类型')
-    object_id = serializers.IntegerField(label='对象主键', min_value=0, required=True)
+    object_id = serializers.IntegerField(label='对象主键', min_value=0, required=False)
+    object_ids = serializers.ListField(
+        label='对象主键列表', child=serializers.IntegerField(min_value=0), required=False, allow_empty=False,
+        help_text='同时给多个对象打标签，与 `object_id` 二选一。'
+    )
     tags = serializers.CharField(label='标签', allow_blank=True, help_text='多标签可被任意除连字符 `-` 以外的符号分隔。')
 
     class Meta:
         model = TaggedItem
-        fields = ['content_type', 'object_id', 'tags']
+        fields = ['content_type', 'object_id', 'object_ids', 'tags']
 
     def validate_tags(self, value):
-        return list(word_tokenize(value))
+        return list(dict.fromkeys(word_tokenize(value)))
 
     def validate(self, attrs):
-        # 多重继承中的父类均有相同的子方法按照`__mro__`顺序查找并执行
-        attrs = super().validate(attrs)
+        object_ids = attrs.get('object_ids') or ([attrs['object_id']] if 'object_id' in attrs else [])
+        if not object_ids:
+            raise ValidationError({'object_id': self.fields['object_id'].error_messages['required']})
+        object_ids = list(dict.fromkeys(object_ids))
+
+        model = attrs['content_type'].model_class()
+        instances = model._default_manager.in_bulk(object_ids)
+        if len(instances) != len(object_ids):
+            raise ValidationError({'object_id': Messages.OBJECT_NOT_FOUND})
 
-        instance = attrs['instance']
         request = self.context['request']
-        if not (hasattr(instance, 'is_owned') and instance.is_owned(request.user)):
-            raise ValidationError(Messages.INSTANCE_NOT_ALLOWED.format(attrs['content_type'], instance.pk))
+        for pk in object_ids:
+            instance = instances[pk]
+            if not (hasattr(instance, 'is_owned') and instance.is_owned(request.user)):
+                raise ValidationError(Messages.INSTANCE_NOT_ALLOWED.format(attrs['content_type'], pk))
 
+        attrs['object_ids'] = object_ids
         return attrs
 
     def bulk_create(self):
+        """查询次数固定，与标签和对象的数量无关"""
+        if not self.validated_data['tags']:
+            return []
+
         with transaction.atomic():
-            ret = list(map(itemgetter(0), [
-                TaggedItem.objects.get_or_create(
-                    tag=tag,
-                    content_type=self.validated_data['content_type'],
-                    object_id=self.validated_data['instance'].pk
-                ) for tag in map(itemgetter(0), [Tag.objects.get_or_create(name=tag) for tag in self.validated_data['tags']])
-            ]))
-        return ret
+            tags = Tag.objects.get_or_create_many(self.validated_data['tags'])
+            # 名称不同但 slug 相同的标签是同一个
+            tags = list({tag.pk: tag for tag in tags.values()}.values())
+            content_type = self.validated_data['content_type']
+            return TaggedItem.objects.bulk_tag(content_type, self.validated_data['object_ids'], tags)
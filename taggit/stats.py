@@ -0,0 +1,64 @@
+from django.db import connection, transaction
+
+from taggit.models import Tag, TagPair, TagStat, TaggedItem
+
+
+def rebuild_stats():
+    """按标签项重新统计使用次数，修正并发写入造成的偏差
+
+    Returns:
+        int: 修正的行数
+    """
+    stats = connection.ops.quote_name(TagStat._meta.db_table)
+    items = connection.ops.quote_name(TaggedItem._meta.db_table)
+    # 不先清空统计表，清空期间并发的增减会作用在被删除的行上而丢失
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {stats} AS s (tag_id, content_type_id, count) '
+            f'SELECT tag_id, content_type_id, COUNT(*) FROM {items} GROUP BY tag_id, content_type_id '
+            f'ON CONFLICT (tag_id, content_type_id) DO UPDATE SET count = EXCLUDED.count '
+            f'WHERE s.count IS DISTINCT FROM EXCLUDED.count'
+        )
+        updated = cursor.rowcount
+        # 只删除已经没有标签项的统计
+        cursor.execute(
+            f'DELETE FROM {stats} s WHERE NOT EXISTS ('
+            f'SELECT 1 FROM {items} i WHERE i.tag_id = s.tag_id AND i.content_type_id = s.content_type_id)'
+        )
+        return updated + cursor.rowcount
+
+
+def rebuild_pairs(top_k, batch_size):
+    """
+    重建标签共现表，每个标签保留共现次数最多的 `top_k` 个
+
+    按标签主键分批自连接标签项，每批一个事务，读取相关标签时不再需要自连接。
+
+    Returns:
+        int: 写入的行数
+    """
+    pairs = connection.ops.quote_name(TagPair._meta.db_table)
+    items = connection.ops.quote_name(TaggedItem._meta.db_table)
+    sql = (
+        f'INSERT INTO {pairs} (tag_id, related_id, count) '
+        f'SELECT tag_id, related_id, count FROM ('
+        f'  SELECT a.tag_id, b.tag_id AS related_id, COUNT(*) AS count,'
+        f'    ROW_NUMBER() OVER (PARTITION BY a.tag_id ORDER BY COUNT(*) DESC, b.tag_id) AS rank'
+        f'  FROM {items} a JOIN {items} b'
+        f'    ON a.content_type_id = b.content_type_id AND a.object_id = b.object_id AND a.tag_id <> b.tag_id'
+        f'  WHERE a.tag_id >= %s AND a.tag_id <= %s'
+        f'  GROUP BY a.tag_id, b.tag_id'
+        f') AS ranked WHERE rank <= %s'
+    )
+
+    count = 0
+    tag_ids = Tag.objects.order_by('id').values_list('id', flat=True)
+    last = 0
+    while batch := list(tag_ids.filter(id__gt=last)[:batch_size]):
+        first, last = batch[0], batch[-1]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {pairs} WHERE tag_id >= %s AND tag_id <= %s', [first, last])
+            cursor.execute(sql, [first, last, top_k])
+            count += cursor.rowcount
+    # 已删除的标签由外键级联删除
+    return count
@@ -0,0 +1,12 @@
+from celery import shared_task
+from django.conf import settings
+
+from taggit.stats import rebuild_pairs, rebuild_stats
+
+
+@shared_task
+def rebuild_tag_stats():
+    return {
+        'stats': rebuild_stats(),
+        'pairs': rebuild_pairs(settings.TAGGIT['RELATED_TOP_K'], settings.TAGGIT['REBUILD_BATCH_SIZE']),
+    }
@@ -1,10 +1,15 @@
+from django.conf import settings
+from django.db.models.aggregates import Sum
+from django.db.models.query_utils import Q
 from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from commons.fields.serializers import ContentTypeNaturalKeyField
 from commons.permissions import IsOwnerOrReadOnly, IsAdminOrReadOnly
 from taggit.models import Tag, TaggedItem
-from taggit.serializers import TagSerializer, TaggedItemSerializer, BulkTaggedSerializer
+from taggit.serializers import TagSerializer, TaggedItemSerializer, BulkTaggedSerializer, PopularTagSerializer, \
+    TagPairSerializer
 
 
 class TagViewSet(viewsets.ModelViewSet):
@@ -14,8 +19,33 @@ class TagViewSet(viewsets.ModelViewSet):
 
     @action(methods=['get'], detail=True)
     def items(self, *args, **kwargs):
-        items = self.get_object().items.all()
-        return Response(TaggedItemSerializer(items, many=True).data)
+        items = self.get_object().items.select_related('tag', 'content_type').prefetch_related('content_object')
+        page = self.paginate_queryset(items)
+        serializer = TaggedItemSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False)
+    def popular(self, request, *args, **kwargs):
+        """
+        热门标签，按使用次数排序
+
+        参数 content_type 可选，如 `weblog.article`，只统计该类型上的使用次数
+        """
+        condition = Q()
+        content_type = request.query_params.get('content_type')
+        if content_type:
+            condition = Q(stats__content_type=ContentTypeNaturalKeyField().run_validation(content_type))
+
+        queryset = Tag.objects.annotate(usage=Sum('stats__count', filter=condition)) \
+            .filter(usage__gt=0).order_by('-usage', 'id')
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(PopularTagSerializer(page, many=True).data)
+
+    @action(methods=['get'], detail=True)
+    def related(self, *args, **kwargs):
+        """相关标签，按在同一对象上共同出现的次数排序，来自预先计算的结果"""
+        pairs = self.get_object().pairs.select_related('related')[:settings.TAGGIT['RELATED_TOP_K']]
+        return Response(TagPairSerializer(pairs, many=True).data)
 
 
 class TaggedItemViewSet(
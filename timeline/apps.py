@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+
+
+class TimelineConfig(AppConfig):
+    name = 'timeline'
+    verbose_name = '时间线'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from follows.models import Follow
+        from timeline.feeds import FEED_MODELS, followed, published
+
+        for model in FEED_MODELS:
+            post_save.connect(published, sender=model)
+
+        post_save.connect(followed, sender=Follow)
+        post_delete.connect(followed, sender=Follow)
@@ -0,0 +1,179 @@
+from datetime import datetime, timezone
+from heapq import merge
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django_redis import get_redis_connection
+
+from commons.constants import CacheKeySet
+from counters.models import Counter
+from follows.models import Follow
+from weblog.models import Article, Post
+
+# 出现在时间线中的模型
+FEED_MODELS = [Article, Post]
+
+# 时间线存在时才写入，不存在说明用户近期不活跃，等到读取时再重建
+PUSH_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('zadd', KEYS[1], ARGV[2], ARGV[1])
+    redis.call('zremrangebyrank', KEYS[1], 0, -tonumber(ARGV[3]) - 1)
+end
+"""
+
+
+def get_key(user_id):
+    return CacheKeySet.TIMELINE.format(uid=user_id)
+
+
+def get_member(obj):
+    return f'{obj._meta.label_lower}:{obj.pk}'
+
+
+def get_score(obj):
+    return obj.created.timestamp()
+
+
+def get_queryset(model):
+    queryset = model._default_manager.all()
+    if model is Article:
+        queryset = queryset.filter(status=Article.Status.PUBLISHED)
+    return queryset
+
+
+def get_follower_ids(user_id):
+    ct = ContentType.objects.get_for_model(get_user_model())
+    return Follow.objects.filter(content_type=ct, object_id=user_id).values_list('sender_id', flat=True)
+
+
+def get_following_ids(user_id):
+    ct = ContentType.objects.get_for_model(get_user_model())
+    return Follow.objects.filter(content_type=ct, sender_id=user_id).values_list('object_id', flat=True)
+
+
+def get_fanin_ids(user_ids):
+    """粉丝数超过阈值的用户，发布时不推送，读取时拉取"""
+    ct = ContentType.objects.get_for_model(get_user_model())
+    return Counter.objects.filter(
+        content_type=ct,
+        object_id__in=user_ids,
+        follower_count__gte=settings.TIMELINE['FANIN_THRESHOLD']
+    ).values_list('object_id', flat=True)
+
+
+def is_fanin(user_id):
+    return get_fanin_ids([user_id]).exists()
+
+
+def push(user_ids, member, score):
+    """将一条内容推送到多个用户的时间线"""
+    conn = get_redis_connection()
+    script = conn.register_script(PUSH_SCRIPT)
+    pipe = conn.pipeline(transaction=False)
+    for user_id in user_ids:
+        script(keys=[get_key(user_id)], args=[member, score, settings.TIMELINE['MAX_LENGTH']], client=pipe)
+    pipe.execute()
+
+
+def rebuild(user_id):
+    """从数据库重建用户的时间线，包含自己和关注的人发布的内容"""
+    author_ids = list(get_following_ids(user_id)) + [user_id]
+    max_length = settings.TIMELINE['MAX_LENGTH']
+
+    items = {}
+    for model in FEED_MODELS:
+        queryset = get_queryset(model).filter(author__in=author_ids).order_by('-created').only('pk', 'created')
+        items.update((get_member(obj), get_score(obj)) for obj in queryset[:max_length])
+
+    key = get_key(user_id)
+    pipe = get_redis_connection().pipeline()
+    pipe.delete(key)
+    # 占位成员，使空时间线也能被缓存
+    pipe.zadd(key, dict(items, **{'': 0}))
+    pipe.zremrangebyrank(key, 0, -max_length - 2)
+    pipe.expire(key, settings.TIMELINE['TIMEOUT'])
+    pipe.execute()
+
+
+def read(user_id, cursor=None, count=None):
+    """
+    读取时间线，按发布时间倒序，时间相同时按成员倒序
+
+    Args:
+        user_id (int): 用户主键
+        cursor (tuple): 上一页最后一条内容的时间戳和成员，不包含在结果中
+        count (int): 条数
+
+    Returns:
+        (list, tuple): `app_label.model:pk` 列表以及下一页的游标
+    """
+    count = count or settings.TIMELINE['PAGE_SIZE']
+    conn = get_redis_connection()
+    key = get_key(user_id)
+    # 不在读取时延长过期时间，时间线最多缓存 `TIMEOUT` 后从数据库重建
+    if not conn.exists(key):
+        rebuild(user_id)
+
+    def after(entry):
+        return cursor is None or entry < cursor
+
+    # 推送到时间线中的内容，与游标时间相同的内容可能在上一页之后，包含边界后再过滤
+    if cursor is None:
+        entries = conn.zrevrangebyscore(key, '+inf', '(0', start=0, num=count, withscores=True)
+    else:
+        score = repr(cursor[0])
+        ties = conn.zcount(key, score, score)
+        entries = conn.zrevrangebyscore(key, score, '(0', start=0, num=count + ties, withscores=True)
+    pushed = [entry for entry in ((score, member.decode()) for member, score in entries) if after(entry)]
+
+    # 拉取粉丝数较多的用户发布的内容
+    pulled = []
+    fanin_ids = list(get_fanin_ids(get_following_ids(user_id)))
+    if fanin_ids:
+        for model in FEED_MODELS:
+            queryset = get_queryset(model).filter(author__in=fanin_ids).order_by('-created').only('pk', 'created')
+            objs = []
+            if cursor is not None:
+                created = datetime.fromtimestamp(cursor[0], tz=timezone.utc)
+                objs.extend(queryset.filter(created=created))
+                queryset = queryset.filter(created__lt=created)
+            objs.extend(queryset[:count])
+            pulled.append(sorted(filter(after, ((get_score(obj), get_member(obj)) for obj in objs)), reverse=True))
+
+    entries, seen = [], set()
+    for score, member in merge(pushed, *pulled, reverse=True):
+        if member not in seen:
+            seen.add(member)
+            entries.append((score, member))
+        if len(entries) == count:
+            break
+
+    return [member for _, member in entries], (entries[-1] if len(entries) == count else None)
+
+
+def published(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """内容发布后异步推送到粉丝的时间线"""
+    if raw:
+        return
+    if sender is Article:
+        status_changed = created or update_fields is None or 'status' in update_fields
+        if instance.status != Article.Status.PUBLISHED or not status_changed:
+            return
+    elif not created:
+        return
+
+    from timeline.tasks import publish
+    transaction.on_commit(lambda: publish.delay(sender._meta.label, instance.pk))
+
+
+def invalidate(user_id):
+    get_redis_connection().delete(get_key(user_id))
+
+
+def followed(sender, instance, raw=False, **kwargs):
+    """关注或取消关注用户后删除关注者的时间线，下次读取时按新的关注列表重建"""
+    if raw or instance.content_type_id != ContentType.objects.get_for_model(get_user_model()).pk:
+        return
+    transaction.on_commit(lambda: invalidate(instance.sender_id))
@@ -0,0 +1,31 @@
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+
+from commons.utils import chunks
+from timeline import feeds
+
+
+@shared_task
+def publish(label, pk):
+    obj = apps.get_model(label)._base_manager.filter(pk=pk).first()
+    if obj is None:
+        return
+
+    member, score = feeds.get_member(obj), feeds.get_score(obj)
+
+    # 作者自己的时间线
+    feeds.push([obj.author_id], member, score)
+
+    # 粉丝较多的作者由读取方拉取
+    if feeds.is_fanin(obj.author_id):
+        return
+
+    follower_ids = feeds.get_follower_ids(obj.author_id).iterator()
+    for user_ids in chunks(follower_ids, settings.TIMELINE['FANOUT_BATCH_SIZE']):
+        fanout.delay(user_ids, member, score)
+
+
+@shared_task
+def fanout(user_ids, member, score):
+    feeds.push(user_ids, member, score)
@@ -1,5 +1,8 @@
 import os
 from django.core.asgi import get_asgi_application
 
+from weapp.config import start_reloader
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weapp.settings')
 application = get_asgi_application()
+start_reloader()
@@ -1,9 +1,15 @@
-import types
 import collections
+import logging
+import signal
+import threading
+import time
+import types
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+logger = logging.getLogger(__name__)
+
 
 def isuppercase(name):
     return name == name.upper() and not name.startswith('_')
@@ -14,50 +20,97 @@ def uppercase_attributes(obj):
 
 
 class Config(collections.UserDict):
-    # https://github.com/henriquebastos/python-decouple
+    """
+    从配置文件读取的配置，读取配置就是普通的字典查找
+
+    调用 `watch` 后由后台线程每隔 `interval` 秒检查文件修改时间，`sighup` 为真时也可以发送
+    `SIGHUP` 立即重新加载。每次加载 `generation` 加一，依赖配置计算出的值可以记下 `generation`，
+    不一致时重新计算；也可以用 `connect` 注册重新加载后的回调。
 
-    def __init__(self, filename, auto_reload=False):
+    https://github.com/henriquebastos/python-decouple
+    """
+
+    def __init__(self, filename, interval=2):
         super().__init__()
-        self.auto_reload = auto_reload
         self.filename = filename
-        self._load()
-        if self.auto_reload:
-            self._settings()
-
-    @staticmethod
-    def _settings():
-        import importlib
-        from django.conf import settings
-        from django.conf import LazySettings
-        from django.utils.functional import empty
-
-        def __getattr__(self, name):
-            if self._wrapped is empty:
-                self._setup(name)
-            mod = importlib.import_module(self._wrapped.SETTINGS_MODULE)
-            val = getattr(mod, 'config')[name] or getattr(self._wrapped, name)
-            return val
-
-        LazySettings.__getattr__ = __getattr__
-        settings.__dict__.clear()
-
-    def _load(self):
+        self.interval = interval
+        self.generation = 0
+        self.mtime = None
+        self.failed_mtime = None
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
         d = types.ModuleType('config')
-        d.__file__ = self.filename
+        d.__file__ = str(self.filename)
 
+        mtime = Path(self.filename).stat().st_mtime
         with open(self.filename, 'rb') as f:
             exec(compile(f.read(), self.filename, 'exec'), d.__dict__)
 
-        for name in uppercase_attributes(d):
-            self[name] = getattr(d, name)
-
-        self.old_time = Path(self.filename).stat().st_mtime
-
-    def __getitem__(self, key):
-        file_changed = Path(self.filename).stat().st_mtime > self.old_time
-        if self.auto_reload and file_changed:
-            self._load()
-        return super().__getitem__(key)
+        # 整体替换，读取时不会看到加载了一半的配置
+        with self.lock:
+            self.data = {name: getattr(d, name) for name in uppercase_attributes(d)}
+            self.mtime = mtime
+            self.generation += 1
+
+        # 一个回调出错不影响其他回调
+        for callback in self.callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.exception('Config reload callback %r failed', callback)
+
+    def reload(self, force=False):
+        """文件有修改时重新加载，配置文件有错误时保留原来的配置，同一个错误的文件只记录一次"""
+        mtime = None
+        try:
+            mtime = Path(self.filename).stat().st_mtime
+            if force or mtime not in (self.mtime, self.failed_mtime):
+                self.load()
+                return True
+        except Exception:
+            self.failed_mtime = mtime
+            logger.exception('Failed to reload config from %s', self.filename)
+        return False
+
+    def connect(self, callback):
+        self.callbacks.append(callback)
+
+    def watch(self, sighup=False):
+        def poll():
+            while True:
+                time.sleep(self.interval)
+                self.reload()
+
+        threading.Thread(target=poll, name='config-reloader', daemon=True).start()
+
+        # 信号处理函数是进程级的，会覆盖 gunicorn、celery 自己的处理，需要显式开启，且只有主线程可以注册
+        if sighup and hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload(force=True))
+
+
+def apply_to_settings(config):
+    """将重新加载的配置中 `CONFIG_RELOAD['SETTINGS']` 列出的项写入 django settings"""
+    from django.conf import settings
+
+    if config.generation == 1 or not settings.configured:
+        return
+
+    for name in settings.CONFIG_RELOAD['SETTINGS']:
+        if name in config:
+            setattr(settings, name, config[name])
+
+
+def start_reloader():
+    """按 `CONFIG_RELOAD` 开启配置文件的自动重新加载，由 wsgi/asgi 入口调用"""
+    from django.conf import settings
+
+    options = settings.CONFIG_RELOAD
+    if options['AUTO_RELOAD']:
+        config.connect(apply_to_settings)
+        config.watch(sighup=options['SIGHUP'])
 
 
 config = Config(BASE_DIR / 'weapp' / 'settings.dev')
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'corsheaders',
     'rest_framework',
@@ -37,14 +38,16 @@ INSTALLED_APPS = [
     'polls.apps.PollsConfig',
     'poetry.apps.PoetryConfig',
     'wechat.apps.WechatConfig',
+    'counters.apps.CountersConfig',
+    'timeline.apps.TimelineConfig',
 ]
 
 MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    # 'oauth.middleware.NonceMiddleware',
     # 'django.contrib.sessions.middleware.SessionMiddleware',
     'oauth.middleware.TokenMiddleware',  # Wrapped SessionMiddleware
+    # 'oauth.middleware.NonceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,7 +81,7 @@ SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 DATABASES = config['DATABASES']
 
-# CACHES = config['CACHES']
+CACHES = config['CACHES']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
@@ -146,6 +149,91 @@ OAUTH = {
     'CAPTCHA_LIFETIME': timedelta(minutes=10),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'VERIFIED_TOKEN_CACHE_SIZE': 4096,
+    'USER_CACHE_TIMEOUT': timedelta(minutes=5),
+    'USER_CACHE_LOCAL_TIMEOUT': timedelta(seconds=10),
+    'USER_CACHE_LOCAL_SIZE': 1024,
+    'LAST_SEEN_GRANULARITY': timedelta(minutes=1),
+    'NONCE_WINDOW': timedelta(seconds=60),
+    'NONCE_LOCAL_CAPACITY': 100000,  # Redis 不可用时每个时间窗口预计的请求数
+    'NONCE_LOCAL_ERROR_RATE': 0.001,
+}
+
+# 配置文件自动重新加载，只在 wsgi/asgi 入口开启，`SETTINGS` 以外的项重新加载后不写入 settings
+CONFIG_RELOAD = {
+    'AUTO_RELOAD': False,
+    'SIGHUP': False,
+    'SETTINGS': ('DEBUG',),
+}
+
+# 当前用户与对象的关系(喜欢、关注、收藏)，开启缓存后每个用户的关系集合缓存在 Redis 中
+VIEWER_RELATIONS = {
+    'CACHE_ENABLED': False,
+    'CACHE_TIMEOUT': timedelta(hours=1),
+    'CACHE_MAX_MEMBERS': 10000,
+}
+
+# 关注的人发布的内容，普通用户发布时推送到粉丝的时间线，粉丝较多的用户由读取方拉取
+TIMELINE = {
+    'MAX_LENGTH': 800,
+    'PAGE_SIZE': 20,
+    'TIMEOUT': timedelta(days=7),
+    'FANOUT_BATCH_SIZE': 1000,
+    'FANIN_THRESHOLD': 10000,
+}
+
+# 浏览量先累加在 Redis 中，定时批量写入数据库
+VIEW_COUNTS = {
+    'FLUSH_INTERVAL': timedelta(minutes=1),
+    'FLUSH_BATCH_SIZE': 1000,
+    'FLUSH_LOCK_TIMEOUT': timedelta(minutes=5),
+    'FLUSH_LOG_TIMEOUT': timedelta(days=1),
+}
+
+# 标签使用次数随写入更新，相关标签按共现次数定时重建
+TAGGIT = {
+    'RELATED_TOP_K': 20,
+    'REBUILD_INTERVAL': timedelta(hours=1),
+    'REBUILD_BATCH_SIZE': 1000,
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-view-counts': {
+        'task': 'counters.tasks.flush_view_counts',
+        'schedule': VIEW_COUNTS['FLUSH_INTERVAL'],
+    },
+    'rebuild-tag-stats': {
+        'task': 'taggit.tasks.rebuild_tag_stats',
+        'schedule': TAGGIT['REBUILD_INTERVAL'],
+    },
+}
+
+# Markdown 渲染结果按内容哈希缓存，超过 ASYNC_THRESHOLD 个字符的正文在后台渲染
+MARKDOWN = {
+    'CACHE_TIMEOUT': timedelta(days=7),
+    'ASYNC_THRESHOLD': 100000,
+}
+
+# 随机抽样，主键数组和表行数估计缓存在进程内，`ID_CACHE_MAX_SIZE` 为每个进程缓存的主键总数
+SAMPLING = {
+    'ID_CACHE_TIMEOUT': timedelta(minutes=5),
+    'ID_CACHE_MAX_SIZE': 10000000,
+    'ID_CACHE_ENTRIES': 64,
+    'ROW_ESTIMATE_TIMEOUT': timedelta(hours=1),
+    'TABLESAMPLE_OVERSAMPLE': 3,
+}
+
+# 随机诗词，每个诗集的原文主键和累计权重保存在 Redis 有序集合中
+POETRY = {
+    'POOL_BATCH_SIZE': 10000,
+    'POOL_REFRESH_TIMEOUT': timedelta(minutes=10),
+    'POOL_EMPTY_TIMEOUT': timedelta(minutes=5),
+    'DAILY_TIMEOUT': timedelta(days=1),
+}
+
+WECHAT = {
+    'DISPATCH_BATCH_SIZE': 100,
+    'DISPATCH_BUFFER_SIZE': 10000,
 }
 
 # https://docs.djangoproject.com/en/3.2/topics/logging/
@@ -66,14 +66,17 @@ router.register('shisanbai', poetry_views.ShiSanBaiViewSet, 'shisanbai')
 router.register('zhuzijiaxun', poetry_views.ZhuZiJiaXunViewSet, 'zhuzijiaxun')
 router.register('sishuwujing', poetry_views.SiShuWuJingViewSet, 'sishuwujing')
 router.register('youmengying', poetry_views.YouMengYingViewSet, 'youmengying')
+router.register('works', poetry_views.WorkViewSet, 'work')
 
 # 聊天
 router.register('messages', wechat_views.MessageViewSet, 'message')
+router.register('conversations', wechat_views.ConversationViewSet, 'conversation')
 
 urlpatterns = router.urls
 urlpatterns += [
     path('token/', oauth_views.TokenView.as_view(), name='token'),
-    path('captcha/', oauth_views.CaptchaView.as_view(), name='captcha')
+    path('captcha/', oauth_views.CaptchaView.as_view(), name='captcha'),
+    path('poetry/search/', poetry_views.SearchView.as_view(), name='poetry-search')
 ]
 
 
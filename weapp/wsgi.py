@@ -1,5 +1,8 @@
 import os
 from django.core.wsgi import get_wsgi_application
 
+from weapp.config import start_reloader
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'weapp.settings')
 application = get_wsgi_application()
+start_reloader()
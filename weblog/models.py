@@ -4,14 +4,14 @@ from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericRelation
 from django.db import models
-from django.db.models.expressions import F
-from django.utils.text import slugify
-from markdown import markdown
 
 from commons.managers import GenericQuerySet, ManagerDescriptor, GenericReversedManager
+from commons.rendering import MarkdownMixin
+from commons.slugs import UniqueSlugMixin
+from counters.buffers import incr_views
 
 
-class Article(models.Model):
+class Article(UniqueSlugMixin, MarkdownMixin, models.Model):
     class Status(models.IntegerChoices):
         DRAFT = 0, 'Draft'
         PUBLISHED = 1, 'Published'
@@ -60,11 +60,6 @@ class Article(models.Model):
     def __str__(self):
         return self.title
 
-    def save(self, *args, **kwargs):
-        self.slug = self._unique_slug()
-        self.body_html = markdown(self.body, extensions=['fenced_code', 'codehilite'])
-        super().save(*args, **kwargs)
-
     @property
     def excerpt(self):
         return self.shorten(width=200)
@@ -78,29 +73,15 @@ class Article(models.Model):
         return textwrap.shorten(self.body, width=width, placeholder='...')
 
     def viewed(self):
-        self.view_count = F('view_count') + 1
-        self.save(update_fields=['view_count'])
-        self.refresh_from_db()
+        pending = incr_views(self)
+        self.view_count += pending - getattr(self, '_pending_views', 0)
+        self._pending_views = pending
 
     def is_owned(self, user):
         return self.author == user
 
-    def _unique_slug(self):
-        # 如果原标题不存在，则直接使用原标题
-        origin_unique_slug = slugify(self.title, allow_unicode=True)
-        if not self.__class__.objects.filter(slug=origin_unique_slug).exists():
-            return origin_unique_slug
-
-        # 如果原标题存在，则在原标题结尾加数字
-        num = 1
-        unique_slug = f'{origin_unique_slug}-{num}'
-        while self.__class__.objects.filter(slug=unique_slug).exists():
-            unique_slug = f'{origin_unique_slug}-{num}'
-            num += 1
-        return unique_slug
 
-
-class Post(models.Model):
+class Post(MarkdownMixin, models.Model):
     body = models.TextField('正文')
     body_html = models.TextField('源码', editable=False)
     created = models.DateTimeField('创建时间', auto_now_add=True, editable=False)
@@ -131,10 +112,6 @@ class Post(models.Model):
     def __str__(self):
         return self.shorten(width=10)
 
-    def save(self, *args, **kwargs):
-        self.body_html = markdown(self.body, extensions=['fenced_code', 'codehilite'])
-        super().save(*args, **kwargs)
-
     @property
     def excerpt(self):
         return self.shorten(width=200)
@@ -151,7 +128,7 @@ class Post(models.Model):
         return self.author == user
 
 
-class Category(models.Model):
+class Category(UniqueSlugMixin, models.Model):
     name = models.CharField('名称', max_length=32, unique=True)
     desc = models.TextField('描述', blank=True)
     parent = models.ForeignKey(
@@ -168,6 +145,8 @@ class Category(models.Model):
 
     objects = GenericQuerySet.as_manager()
 
+    slug_source = 'name'
+
     class Meta:
         ordering = ['id']
         get_latest_by = 'id'
@@ -177,12 +156,8 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.name, allow_unicode=True)
-        super().save(*args, **kwargs)
-
 
-class Topic(models.Model):
+class Topic(UniqueSlugMixin, models.Model):
     creator = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -198,6 +173,8 @@ class Topic(models.Model):
 
     objects = GenericQuerySet.as_manager()
 
+    slug_source = 'name'
+
     class Meta:
         ordering = ['id']
         get_latest_by = 'id'
@@ -207,9 +184,5 @@ class Topic(models.Model):
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        self.slug = slugify(self.name, allow_unicode=True)
-        super().save(*args, **kwargs)
-
     def is_owned(self, user):
         return self.creator == user
@@ -1,6 +1,14 @@
 from rest_framework import serializers
 
-from commons.fields.serializers import UniqueFieldsMixin
+from commons.fields.serializers import (
+    DynamicFieldsMixin,
+    PendingViewsListSerializer,
+    PendingViewsMixin,
+    UniqueFieldsMixin,
+    ViewerRelationField,
+    ViewerRelationsListSerializer,
+    ViewerRelationsMixin
+)
 from weblog.models import Article, Post, Category, Topic
 from oauth.serializers import UserSerializer
 
@@ -19,20 +27,29 @@ class TopicSerializer(UniqueFieldsMixin, serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(PendingViewsListSerializer, ViewerRelationsListSerializer):
+    pass
+
+
+class ArticleSerializer(DynamicFieldsMixin, PendingViewsMixin, ViewerRelationsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     excerpt = serializers.ReadOnlyField()
     content_type = serializers.ReadOnlyField()
-    is_liked = serializers.ReadOnlyField()
+    is_liked = ViewerRelationField('liked')
+    is_collected = ViewerRelationField('collected')
     like_count = serializers.ReadOnlyField()
     comment_count = serializers.ReadOnlyField()
     collect_count = serializers.ReadOnlyField()
     category = CategorySerializer(label='分类', required=False, omit_fields=['name'])
     topics = TopicSerializer(label='话题', required=False, many=True, omit_fields=['name'])
+    tags = serializers.SlugRelatedField(label='标签', many=True, read_only=True, slug_field='name')
+    likers = serializers.SlugRelatedField(label='喜欢的人', many=True, read_only=True, slug_field='username')
 
     class Meta:
         model = Article
         fields = '__all__'
+        expandable_fields = ['tags', 'likers']
+        list_serializer_class = ArticleListSerializer
 
     def create(self, validated_data):
         topics = validated_data.pop('topics', [])
@@ -83,15 +100,19 @@ class ArticleSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, ViewerRelationsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     excerpt = serializers.ReadOnlyField()
     content_type = serializers.ReadOnlyField()
-    is_liked = serializers.ReadOnlyField()
+    is_liked = ViewerRelationField('liked')
+    is_collected = ViewerRelationField('collected')
     like_count = serializers.ReadOnlyField()
     comment_count = serializers.ReadOnlyField()
     collect_count = serializers.ReadOnlyField()
+    likers = serializers.SlugRelatedField(label='喜欢的人', many=True, read_only=True, slug_field='username')
 
     class Meta:
         model = Post
         fields = '__all__'
+        expandable_fields = ['likers']
+        list_serializer_class = ViewerRelationsListSerializer
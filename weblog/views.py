@@ -30,7 +30,7 @@ class ArticleViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=True, renderer_classes=[renderers.StaticHTMLRenderer])
     def highlight(self, request, *args, **kwargs):
         article = self.get_object()
-        return Response(article.body_html)
+        return Response(article.rendered_html)
 
     @action(methods=['get'], detail=True)
     def likers(self, request, *args, **kwargs):
@@ -74,7 +74,7 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(methods=['get'], detail=True, renderer_classes=[renderers.StaticHTMLRenderer])
     def highlight(self, request, *args, **kwargs):
         post = self.get_object()
-        return Response(post.body_html)
+        return Response(post.rendered_html)
 
     @action(methods=['get'], detail=True)
     def likers(self, request, *args, **kwargs):
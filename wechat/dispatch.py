@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class Dispatcher:
+    """
+    频道层通知的发送器，请求线程只把通知放入缓冲区
+
+    后台线程运行一个常驻的事件循环，每次取出缓冲区中已有的通知，最多 `DISPATCH_BATCH_SIZE` 条，
+    用 `asyncio.gather` 并发发送到频道层。缓冲区为空时线程阻塞等待，放入的通知立即被取走，
+    不需要等待定时刷新。缓冲区满时丢弃通知，消息已经写入数据库，客户端仍然可以通过接口获取。
+    进程 fork 后后台线程不会被继承，按进程号重新启动。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffer = None
+        self.pid = None
+
+    def start(self):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.buffer = queue.Queue(maxsize=settings.WECHAT['DISPATCH_BUFFER_SIZE'])
+            self.pid = os.getpid()
+            threading.Thread(target=self.run, args=(self.buffer,), name='wechat-dispatcher', daemon=True).start()
+
+    def send(self, group, message):
+        if self.pid != os.getpid():
+            self.start()
+        try:
+            self.buffer.put_nowait((group, message))
+        except queue.Full:
+            logger.warning('Notification buffer is full, dropping message to group %s', group)
+
+    def drain(self, buffer):
+        batch = [buffer.get()]
+        while len(batch) < settings.WECHAT['DISPATCH_BATCH_SIZE']:
+            try:
+                batch.append(buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self, buffer):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while True:
+                batch = self.drain(buffer)
+                # 一批出错只丢弃这一批，线程继续运行
+                try:
+                    loop.run_until_complete(self.flush(get_channel_layer(), batch))
+                except Exception:
+                    logger.exception('Failed to dispatch %d notifications', len(batch))
+        finally:
+            # 线程意外退出时，下次发送重新启动
+            with self.lock:
+                if self.buffer is buffer:
+                    self.pid = None
+
+    async def flush(self, channel_layer, batch):
+        if channel_layer is None:
+            raise ImproperlyConfigured('CHANNEL_LAYERS is not configured')
+        results = await asyncio.gather(
+            *(channel_layer.group_send(group, message) for group, message in batch),
+            return_exceptions=True
+        )
+        for (group, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error('Failed to notify group %s', group, exc_info=result)
+
+
+dispatcher = Dispatcher()
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wechat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity', models.DateTimeField(verbose_name='最后活动时间')),
+                ('unread_a', models.PositiveIntegerField(default=0, verbose_name='用户甲未读数')),
+                ('unread_b', models.PositiveIntegerField(default=0, verbose_name='用户乙未读数')),
+            ],
+            options={
+                'verbose_name': '会话',
+                'verbose_name_plural': '会话',
+                'ordering': ['-last_activity', '-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'id'], name='wechat_mess_sender__fcce10_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wechat.message', verbose_name='最后一条消息'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='用户甲'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_b',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='用户乙'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_a', '-last_activity', '-id'], name='wechat_conv_user_a__608953_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_b', '-last_activity', '-id'], name='wechat_conv_user_b__6482b6_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user_a', 'user_b'), name='wechat_conversation_unique_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(check=models.Q(('user_a__lte', django.db.models.expressions.F('user_b'))), name='wechat_conversation_ordered_pair'),
+        ),
+        # 已有消息按用户对生成会话，未读数从零开始
+        migrations.RunSQL(
+            'INSERT INTO wechat_conversation (user_a_id, user_b_id, last_message_id, last_activity, unread_a, unread_b) '
+            'SELECT LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id), MAX(id), MAX(created), 0, 0 '
+            'FROM wechat_message GROUP BY 1, 2',
+            migrations.RunSQL.noop,
+        ),
+    ]
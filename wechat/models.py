@@ -1,9 +1,10 @@
 import textwrap
-from django.db import models
+from django.db import models, transaction
+from django.db.models.expressions import F
+from django.db.models.functions import Greatest
 from django.conf import settings
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from wechat.dispatch import dispatcher
 
 
 class Message(models.Model):
@@ -29,16 +30,22 @@ class Message(models.Model):
         get_latest_by = 'id'
         verbose_name = '消息'
         verbose_name_plural = verbose_name
+        # 会话内的消息按两个方向各走一次索引，不扫描整个消息表
+        indexes = [models.Index(fields=['sender', 'receiver', 'id'])]
 
     def __str__(self):
         return textwrap.shorten(self.body, width=10, placeholder='...')
 
     def save(self, *args, **kwargs):
-        new = self.id
+        is_new = self.pk is None
         self.body = self.body.strip()
-        super().save(*args, **kwargs)
-        if new is None:
-            self.notify_clients()
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if is_new:
+                Conversation.objects.touch(self)
+                # 提交后才通知，客户端收到通知时一定能查到消息
+                transaction.on_commit(self.notify_clients, using=using)
 
     def is_owned(self, user):
         return self.sender == user
@@ -49,7 +56,100 @@ class Message(models.Model):
             'message': f'{self.id}'
         }
 
-        channel_layer = get_channel_layer()
+        # 只用外键的值，不查询用户；给自己发消息只通知一次
+        for user_id in {self.sender_id, self.receiver_id}:
+            dispatcher.send(f'{user_id}', msg)
 
-        async_to_sync(channel_layer.group_send)(f'{self.sender.pk}', msg)
-        async_to_sync(channel_layer.group_send)(f'{self.receiver.pk}', msg)
+
+class ConversationManager(models.Manager):
+
+    def get_pair(self, user_id, other_id):
+        """两个用户按主键排序，同一对用户只有一个会话"""
+        user_a_id, user_b_id = sorted([user_id, other_id])
+        return {'user_a_id': user_a_id, 'user_b_id': user_b_id}
+
+    def touch(self, message):
+        """新消息写入会话摘要，接收方未读数加一，会话行不存在时先创建"""
+        lookups = self.get_pair(message.sender_id, message.receiver_id)
+        unread = 'unread_a' if lookups['user_a_id'] == message.receiver_id else 'unread_b'
+        # 并发写入时只保留较新的消息
+        values = {
+            'last_message_id': Greatest(F('last_message_id'), message.id),
+            'last_activity': Greatest(F('last_activity'), message.created),
+            unread: F(unread) + 1,
+        }
+        # 给自己发消息不计未读
+        if message.sender_id == message.receiver_id:
+            del values[unread]
+        with transaction.atomic(using=self.db):
+            if not self.filter(**lookups).update(**values):
+                self.bulk_create([self.model(**lookups, last_activity=message.created)], ignore_conflicts=True)
+                self.filter(**lookups).update(**values)
+
+    def mark_read(self, conversation, user):
+        unread = 'unread_a' if conversation.user_a_id == user.pk else 'unread_b'
+        self.filter(pk=conversation.pk).update(**{unread: 0})
+        setattr(conversation, unread, 0)
+
+
+class Conversation(models.Model):
+    """两个用户之间的会话摘要，随消息写入更新，会话列表不需要聚合消息表"""
+    user_a = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户甲'
+    )
+    user_b = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='用户乙'
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='最后一条消息'
+    )
+    last_activity = models.DateTimeField('最后活动时间')
+    unread_a = models.PositiveIntegerField('用户甲未读数', default=0)
+    unread_b = models.PositiveIntegerField('用户乙未读数', default=0)
+
+    objects = ConversationManager()
+
+    class Meta:
+        ordering = ['-last_activity', '-id']
+        verbose_name = '会话'
+        verbose_name_plural = verbose_name
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b'], name='wechat_conversation_unique_pair'),
+            models.CheckConstraint(check=models.Q(user_a__lte=F('user_b')), name='wechat_conversation_ordered_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['user_a', '-last_activity', '-id']),
+            models.Index(fields=['user_b', '-last_activity', '-id']),
+        ]
+
+    def __str__(self):
+        return f'{self.user_a_id}-{self.user_b_id}'
+
+    def get_other_id(self, user):
+        return self.user_b_id if self.user_a_id == user.pk else self.user_a_id
+
+    def get_unread(self, user):
+        return self.unread_a if self.user_a_id == user.pk else self.unread_b
+
+    def get_messages(self):
+        """两个方向的消息分成两个查询集，各自命中 (sender, receiver, id) 索引，给自己发消息时只有一个"""
+        if self.user_a_id == self.user_b_id:
+            return [Message.objects.filter(sender_id=self.user_a_id, receiver_id=self.user_a_id)]
+        return [
+            Message.objects.filter(sender_id=self.user_a_id, receiver_id=self.user_b_id),
+            Message.objects.filter(sender_id=self.user_b_id, receiver_id=self.user_a_id),
+        ]
+
+    def is_owned(self, user):
+        return user.pk in (self.user_a_id, self.user_b_id)
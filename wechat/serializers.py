@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from wechat.models import Message
+from wechat.models import Conversation, Message
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -13,3 +13,22 @@ class MessageSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         message = Message.objects.create(**validated_data)
         return message
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """会话列表按当前用户展示对方和自己的未读数"""
+    user = serializers.SerializerMethodField()
+    unread = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'user', 'last_message', 'last_activity', 'unread']
+
+    def get_user(self, obj):
+        me = self.context['request'].user
+        other = obj.user_b if obj.user_a_id == me.pk else obj.user_a
+        return {'id': other.pk, 'username': other.username}
+
+    def get_unread(self, obj):
+        return obj.get_unread(self.context['request'].user)
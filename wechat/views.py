@@ -1,7 +1,11 @@
+from django.db.models import Q
 from rest_framework import mixins, viewsets
-from wechat.models import Message
-from wechat.serializers import MessageSerializer
-from commons.permissions import IsOwnerOrReadOnly
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from wechat.models import Conversation, Message
+from wechat.serializers import ConversationSerializer, MessageSerializer
+from commons.pagination import KeysetPagination
+from commons.permissions import IsOwnerOrAdmin, IsOwnerOrReadOnly
 
 
 class MessageViewSet(
@@ -23,3 +27,37 @@ class MessageViewSet(
 
     def perform_create(self, serializer):
         serializer.save(sender=self.request.user)
+
+
+class ConversationViewSet(
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet
+):
+    queryset = Conversation.objects.all().select_related(
+        'user_a', 'user_b', 'last_message__sender', 'last_message__receiver'
+    )
+    serializer_class = ConversationSerializer
+    permission_classes = [IsOwnerOrAdmin]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        # 只能看到自己参与的会话，按最后活动时间倒序分页
+        user = self.request.user
+        return super().get_queryset().filter(Q(user_a=user) | Q(user_b=user))
+
+    @action(detail=True)
+    def messages(self, request, pk=None):
+        """会话中的消息，按时间倒序分页，读取第一页时清零当前用户的未读数"""
+        conversation = self.get_object()
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            Conversation.objects.mark_read(conversation, request.user)
+        querysets = [queryset.select_related('sender', 'receiver').order_by('-id') for queryset in conversation.get_messages()]
+        page = self.paginator.paginate_querysets(querysets, request, view=self)
+        return self.get_paginated_response(MessageSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        conversation = self.get_object()
+        Conversation.objects.mark_read(conversation, request.user)
+        return Response(self.get_serializer(conversation).data)